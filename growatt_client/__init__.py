@@ -1 +1,17 @@
-from .growatt import *
\ No newline at end of file
+from .growatt import *
+from .planner import *
+from .decoder import *
+from .template import *
+from .metrics import *
+from .policy import *
+from .snapshot import *
+from .limiter import *
+from .bus import *
+from .fleet import *
+from .recording import *
+from .discovery import *
+from .identity import *
+from .aggregate import *
+from .counters import *
+from .shared import *
+from .maps import *
@@ -0,0 +1,294 @@
+"""
+Aggregate power attributes over tumbling and sliding time windows.
+
+Windows are built from panes of step seconds, each holding the count,
+sum, minimum, maximum and integrated energy of every attribute, so the
+memory used depends on the number of panes in a window and not on the
+number of samples.
+"""
+import math
+import time
+from collections import deque
+
+from .const import EXPORT_TO_GRID, IMPORT_FROM_GRID, LOCAL_LOAD, PHOTOVOLTAICS
+
+__all__ = ["POWER_ATTRIBUTES", "WindowAggregator", "merge_summaries"]
+
+POWER_ATTRIBUTES = (
+    PHOTOVOLTAICS,
+    LOCAL_LOAD,
+    IMPORT_FROM_GRID,
+    EXPORT_TO_GRID,
+)
+
+
+class _Stats:
+    """Aggregates of one attribute."""
+
+    __slots__ = (
+        "samples",
+        "total",
+        "min",
+        "max",
+        "energy",
+        "covered",
+        "counter",
+    )
+
+    def __init__(self):
+        self.samples = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        # kWh integrated over covered seconds
+        self.energy = 0.0
+        self.covered = 0.0
+        # Increase of the energy counter, None without counter readings
+        self.counter = None
+
+    def merge(self, other):
+        self.samples += other.samples
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.energy += other.energy
+        self.covered += other.covered
+        if other.counter is not None:
+            self.counter = (self.counter or 0.0) + other.counter
+
+    def as_dict(self, length):
+        samples = self.samples
+        result = {
+            "samples": samples,
+            "mean": self.total / samples if samples else math.nan,
+            "min": self.min if samples else math.nan,
+            "max": self.max if samples else math.nan,
+            "energy": round(self.energy, 6),
+            "covered": self.covered,
+            "coverage": self.covered / length if length else math.nan,
+            "counter": self.counter,
+        }
+        if self.counter is not None:
+            result["counter_deviation"] = round(self.energy - self.counter, 6)
+        return result
+
+
+class _Pane:
+    __slots__ = ("start", "stats")
+
+    def __init__(self, start, names):
+        self.start = start
+        self.stats = {name: _Stats() for name in names}
+
+    def is_empty(self):
+        return not any(
+            s.samples or s.covered or s.counter for s in self.stats.values()
+        )
+
+
+class WindowAggregator:
+    """
+    Averages, extremes and energy of power attributes per time window.
+
+    Windows are length seconds long and a window ends every step
+    seconds, tumbling when step is length (the default) and sliding
+    when it is shorter. Windows are aligned to multiples of step from
+    offset seconds after the epoch, use the UTC offset of a time zone
+    to align days to local midnight.
+
+    Power in kW is integrated to kWh between consecutive samples.
+    Samples further apart than max_gap seconds, or a missing value, are
+    a gap: nothing is integrated over it and the coverage of the
+    window drops. counters maps attributes to an energy counter, by
+    default the *_today counter, whose increase is reported next to
+    the integrated energy as a cross-check.
+    """
+
+    def __init__(
+        self,
+        length,
+        step=None,
+        names=POWER_ATTRIBUTES,
+        counters=None,
+        max_gap=300,
+        offset=0,
+    ):
+        step = length if step is None else step
+        panes = round(length / step)
+        if panes < 1 or abs(panes * step - length) > 1e-9:
+            raise ValueError("Window length must be a multiple of step.")
+        self.length = length
+        self.step = step
+        self.names = tuple(names)
+        if counters is None:
+            counters = {name: f"{name}_today" for name in self.names}
+        self.counters = counters
+        self.max_gap = max_gap
+        self.offset = offset
+
+        self._pane = None
+        # Closed panes still part of the next windows
+        self._closed = deque(maxlen=panes - 1)
+        self._time = None
+        # Last valid value and time per attribute, and counter readings
+        self._last = {}
+        self._last_counter = {}
+
+    def _pane_start(self, timestamp):
+        step = self.step
+        return (timestamp - self.offset) // step * step + self.offset
+
+    def add(self, data, timestamp=None):
+        """
+        Add a data dict or Snapshot, timestamp in epoch seconds.
+
+        Returns the summaries of the windows completed by it, oldest
+        first. Samples older than the previous one are ignored.
+        """
+        if timestamp is None:
+            timestamp = getattr(data, "timestamp", math.nan)
+            if timestamp != timestamp:
+                timestamp = time.time()
+        if self._time is not None and timestamp <= self._time:
+            return []
+        self._time = timestamp
+
+        start = self._pane_start(timestamp)
+        if self._pane is None:
+            self._pane = _Pane(start, self.names)
+
+        # Integrate from the last sample, split over the panes between
+        pieces = {}
+        for name in self.names:
+            value = data.get(name, math.nan)
+            last = self._last.get(name)
+            if value != value:
+                self._last.pop(name, None)
+                continue
+            self._last[name] = (timestamp, value)
+            if last is None or timestamp - last[0] > self.max_gap:
+                continue
+            self._split(name, last[0], last[1], timestamp, value, pieces)
+
+        summaries = []
+        while self._pane.start < start:
+            self._apply(self._pane, pieces.pop(self._pane.start, ()))
+            summaries.extend(self._close())
+            following = self._pane.start + self.step
+            if not pieces and all(p.is_empty() for p in self._closed):
+                # Nothing left for windows before the new sample
+                self._closed.clear()
+                following = start
+            self._pane = _Pane(following, self.names)
+        self._apply(self._pane, pieces.pop(start, ()))
+
+        stats = self._pane.stats
+        for name in self.names:
+            last = self._last.get(name)
+            if last is not None and last[0] == timestamp:
+                value = last[1]
+                stat = stats[name]
+                stat.samples += 1
+                stat.total += value
+                stat.min = min(stat.min, value)
+                stat.max = max(stat.max, value)
+
+            counter = self.counters.get(name)
+            reading = data.get(counter, math.nan) if counter else math.nan
+            if reading != reading:
+                continue
+            previous = self._last_counter.get(name)
+            self._last_counter[name] = reading
+            if previous is None:
+                continue
+            # A counter going down was reset, count it from zero
+            increase = reading - previous if reading >= previous else reading
+            stats[name].counter = (stats[name].counter or 0.0) + increase
+        return summaries
+
+    def _split(self, name, t0, v0, t1, v1, pieces):
+        """Add the energy from t0 to t1 to pieces, per pane."""
+        slope = (v1 - v0) / (t1 - t0)
+        a, va = t0, v0
+        while a < t1:
+            pane = self._pane_start(a)
+            b = min(pane + self.step, t1)
+            vb = v0 + slope * (b - t0)
+            pieces.setdefault(pane, []).append(
+                (name, (va + vb) / 2 * (b - a) / 3600, b - a)
+            )
+            a, va = b, vb
+
+    @staticmethod
+    def _apply(pane, pieces):
+        for name, energy, seconds in pieces:
+            stats = pane.stats[name]
+            stats.energy += energy
+            stats.covered += seconds
+
+    def _close(self):
+        """Close the current pane, returns the window ending with it."""
+        pane = self._pane
+        panes = list(self._closed) + [pane]
+        self._closed.append(pane)
+        if all(p.is_empty() for p in panes):
+            return []
+        end = pane.start + self.step
+        return [_summary(end - self.length, end, panes, self.names)]
+
+    def flush(self):
+        """
+        Close the current pane, returns the window ending with it.
+
+        The window is partial when the pane is not over yet.
+        """
+        if self._pane is None:
+            return []
+        summaries = self._close()
+        self._pane = None
+        self._closed.clear()
+        self._time = None
+        self._last.clear()
+        self._last_counter.clear()
+        return summaries
+
+
+def _summary(start, end, panes, names):
+    result = {"start": start, "end": end, "attributes": {}}
+    for name in names:
+        stats = _Stats()
+        for pane in panes:
+            stats.merge(pane.stats[name])
+        result["attributes"][name] = stats.as_dict(end - start)
+    return result
+
+
+def merge_summaries(summaries):
+    """
+    Merge window summaries into one, for a billing period.
+
+    The summaries should not overlap, so tumbling windows. Means are
+    weighted by samples and coverage is relative to the whole period.
+    """
+    summaries = list(summaries)
+    if not summaries:
+        return None
+    start = min(s["start"] for s in summaries)
+    end = max(s["end"] for s in summaries)
+    result = {"start": start, "end": end, "attributes": {}}
+    for name in summaries[0]["attributes"]:
+        stats = _Stats()
+        for summary in summaries:
+            window = summary["attributes"][name]
+            samples = window["samples"]
+            stats.samples += samples
+            if samples:
+                stats.total += window["mean"] * samples
+                stats.min = min(stats.min, window["min"])
+                stats.max = max(stats.max, window["max"])
+            stats.energy += window["energy"]
+            stats.covered += window["covered"]
+            if window["counter"] is not None:
+                stats.counter = (stats.counter or 0.0) + window["counter"]
+        result["attributes"][name] = stats.as_dict(end - start)
+    return result
@@ -0,0 +1,134 @@
+"""
+Benchmark the polling pipeline against the simulator.
+
+    python -m growatt_client.benchmark --attributes consumption grid_voltage
+
+Prints the results as JSON: frames and bytes per poll, the serial time
+those take at each baud rate, and the time and allocations spent in the
+client itself.
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+import tracemalloc
+
+from .const import ATTRIBUTES
+from .growatt import GrowattClient
+from .simulator import InverterSimulator, SimulatedBus, SimulatorClient
+
+__all__ = ["BAUDRATES", "async_benchmark", "main"]
+
+BAUDRATES = (9600, 19200, 115200)
+
+
+def _values(attribute_defs):
+    """Some non zero value for every register attribute."""
+    return {
+        attr["name"]: (index + 1) * 1.5
+        for index, attr in enumerate(attribute_defs)
+        if "pos" in attr
+    }
+
+
+async def async_benchmark(
+    attributes=None, iterations=1000, baudrates=BAUDRATES
+):
+    """Benchmark polling the given attributes, returns a result dict."""
+    bus = SimulatedBus([InverterSimulator(values=_values(ATTRIBUTES))])
+    transport = SimulatorClient(bus, baudrate=None)
+    client = GrowattClient(
+        address=1, attributes=attributes, persistent=True, client=transport
+    )
+    # The first poll also reads the hardware info
+    await client.async_update()
+
+    frames = transport.frames
+    sent = transport.bytes_sent
+    received = transport.bytes_received
+    await client.async_update()
+    frames = transport.frames - frames
+    wire_bytes = transport.bytes_sent - sent
+    wire_bytes += transport.bytes_received - received
+    # Every frame also needs 3.5 characters of silence
+    serial_time = {
+        str(baudrate): (wire_bytes + frames * 7) * 11 / baudrate
+        for baudrate in baudrates
+    }
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        await client.async_update()
+    poll_time = (time.perf_counter() - start) / iterations
+
+    inverter = bus.get_inverter(1)
+    blocks = [
+        (
+            group["decoder"],
+            inverter.input_registers(group["pos"], group["length"]),
+        )
+        for group in client.get_register_plan()
+    ]
+    data = {}
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for decoder, registers in blocks:
+            decoder.decode_into(registers, data)
+    decode_time = (time.perf_counter() - start) / iterations
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for templ in client.templates:
+            data[templ.name] = templ.evaluate(data)
+    template_time = (time.perf_counter() - start) / iterations
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    await client.async_update()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    stats = after.compare_to(before, "lineno")
+    allocations = sum(stat.count_diff for stat in stats if stat.count_diff > 0)
+    allocated = sum(stat.size_diff for stat in stats if stat.size_diff > 0)
+
+    await client.async_close()
+    return {
+        "attributes": attributes,
+        "iterations": iterations,
+        "frames": frames,
+        "bytes": wire_bytes,
+        "serial_time": serial_time,
+        "poll_time": poll_time,
+        "decode_time": decode_time,
+        "template_time": template_time,
+        "allocations": allocations,
+        "allocated_bytes": allocated,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--attributes", nargs="*", help="attributes to poll, default all"
+    )
+    parser.add_argument("--iterations", type=int, default=1000)
+    parser.add_argument(
+        "--baudrates", nargs="*", type=int, default=list(BAUDRATES)
+    )
+    parser.add_argument("--output", help="write the results to a file")
+    args = parser.parse_args(argv)
+
+    result = asyncio.run(
+        async_benchmark(args.attributes, args.iterations, args.baudrates)
+    )
+    text = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
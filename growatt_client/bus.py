@@ -0,0 +1,228 @@
+"""
+Poll several Growatt inverters sharing one RS485 line.
+"""
+import asyncio
+import logging
+import os
+import time
+
+from .const import ATTRIBUTES, DEFAULT_GAP_COST, DEFAULT_PORT, MAX_BLOCK_SIZE
+from .growatt import (
+    GrowattClient,
+    ModbusException,
+    PortException,
+    _pymodbus_error,
+    create_modbus_client,
+)
+
+__all__ = ["GrowattBus"]
+
+_LOGGER = logging.getLogger(__name__)
+_LOGGER.addHandler(logging.NullHandler())
+
+
+class _BusTransport:
+    """
+    Modbus client handed to the inverters of a bus.
+
+    The serial port is opened once and stays open, closing is left to
+    the bus so an inverter that fails a read does not reopen the port.
+    """
+
+    # The bus reports the connect time, only when it opens the port
+    reports_connect = True
+
+    def __init__(self, bus, address):
+        self._bus = bus
+        self._address = address
+
+    async def connect(self):
+        return await self._bus._async_open(self._address)
+
+    async def close(self, reconnect=False):
+        pass
+
+    async def read_input_registers(self, address, count=1, slave=0):
+        return await self._bus._async_call(
+            self._bus._client.read_input_registers, address, count, slave
+        )
+
+    async def read_holding_registers(self, address, count=1, slave=0):
+        return await self._bus._async_call(
+            self._bus._client.read_holding_registers, address, count, slave
+        )
+
+    async def write_register(self, address, value, slave=0):
+        return await self._bus._async_call(
+            self._bus._client.write_register, address, value, slave
+        )
+
+    async def write_registers(self, address, values, slave=0):
+        return await self._bus._async_call(
+            self._bus._client.write_registers, address, values, slave
+        )
+
+
+class GrowattBus:
+    """Serialize the requests of many inverter addresses on one port."""
+
+    def __init__(
+        self,
+        port=DEFAULT_PORT,
+        logger=None,
+        metrics=None,
+        limiter=None,
+        client=None,
+        port_lock=None,
+    ):
+        """Initialize."""
+        self._logger = _LOGGER if logger is None else logger
+
+        self._port = port
+        if client is None:
+            if not os.path.exists(self._port):
+                self._logger.debug(f"USB port {self._port} is not available")
+                raise PortException(f"USB port {self._port} is not available")
+            client = create_modbus_client(port)
+
+        self._metrics = metrics
+        # RateLimiter of the requests, possibly shared with other buses
+        self._limiter = limiter
+        # PortLock held while the port is open, shared with other processes
+        self._port_lock = port_lock
+        self._client = client
+        self._connected = False
+        # Held for a whole inverter poll, one poll at a time on the line.
+        # Created in the running loop, before Python 3.10 a lock binds
+        # to the loop current when it is created
+        self._lock = None
+        self._inverters = {}
+        self._turn = 0
+
+    async def __aenter__(self):
+        await self._async_open()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.async_close()
+
+    def add_inverter(
+        self,
+        address,
+        attributes=None,
+        attribute_defs=ATTRIBUTES,
+        max_block=MAX_BLOCK_SIZE,
+        gap_cost=DEFAULT_GAP_COST,
+        register_maps=None,
+    ):
+        """
+        Add an inverter with its slave address and return its client.
+
+        With register_maps, the inverter reads the register map matching
+        its hardware info, so one bus can carry inverters of different
+        families.
+        """
+        if address in self._inverters:
+            raise ValueError(f"Address {address} is already on the bus.")
+        client = GrowattClient(
+            self._port,
+            address,
+            attributes=attributes,
+            attribute_defs=attribute_defs,
+            logger=self._logger,
+            max_block=max_block,
+            gap_cost=gap_cost,
+            client=_BusTransport(self, address),
+            metrics=self._metrics,
+            register_maps=register_maps,
+        )
+        self._inverters[address] = client
+        return client
+
+    def get_inverter(self, address):
+        return self._inverters[address]
+
+    def get_port(self):
+        return self._port
+
+    def get_addresses(self):
+        return list(self._inverters)
+
+    async def async_update(self, address):
+        """Read the data of one inverter."""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            return await self._inverters[address].async_update()
+
+    async def async_update_all(self, return_exceptions=False):
+        """
+        Read the data of all inverters, one after the other.
+
+        Returns a dict of data per address. The inverter polled first is
+        rotated on every sweep so none of them is always served last.
+        With return_exceptions a failing inverter gets its exception in
+        the dict instead of aborting the sweep.
+        """
+        addresses = list(self._inverters)
+        if not addresses:
+            return {}
+        self._turn %= len(addresses)
+        order = addresses[self._turn :] + addresses[: self._turn]
+        self._turn += 1
+
+        results = {}
+        for address in order:
+            try:
+                results[address] = await self.async_update(address)
+            except ModbusException as error:
+                if not return_exceptions:
+                    raise
+                self._logger.debug(f"Inverter {address} failed: {error}")
+                results[address] = error
+        return {address: results[address] for address in addresses}
+
+    async def async_close(self):
+        """Close the serial port."""
+        if self._connected:
+            self._connected = False
+            await self._client.close()
+            if self._port_lock is not None:
+                self._port_lock.release()
+
+    async def _async_open(self, address=None):
+        """
+        Open the port if it is closed.
+
+        The connect time is reported for the inverter whose request
+        opened the port, address is None when no inverter asked.
+        """
+        if not self._connected:
+            start = time.perf_counter()
+            if self._port_lock is not None:
+                await self._port_lock.acquire()
+            if not await self._client.connect():
+                if self._port_lock is not None:
+                    self._port_lock.release()
+                self._logger.debug("Modbus connection failed.")
+                return False
+            self._connected = True
+            if self._metrics is not None and address is not None:
+                self._metrics.on_connect(address, time.perf_counter() - start)
+        return True
+
+    async def _async_call(self, read, address, count, slave):
+        # Closed by a failed request, the inverter clients still think
+        # they are connected and do not connect again
+        if not await self._async_open(slave):
+            raise ModbusException("Modbus connection failed.")
+        if self._limiter is not None:
+            await self._limiter.acquire()
+        try:
+            return await read(address, count, slave=slave)
+        except _pymodbus_error() as error:
+            # The port itself failed, reopen it on the next request
+            await self.async_close()
+            raise ModbusException(
+                f"Modbus read failed for registers {address}: {error}"
+            )
@@ -3,6 +3,32 @@
 # Defaults
 DEFAULT_PORT = "/dev/ttyUSB0"
 DEFAULT_ADDRESS = 0x1
+DEFAULT_BAUDRATE = 9600
+
+# Register planning
+# Modbus limits a single read request to 125 registers
+MAX_BLOCK_SIZE = 125
+# Cost of an extra round-trip in registers read, frame overhead and the
+# inverter response delay add up to roughly 30 registers at 9600 baud
+DEFAULT_GAP_COST = 30
+
+# Polling tiers, seconds between reads
+TIER_FAST = 0
+TIER_TODAY = 60
+TIER_LIFETIME = 300
+
+# Modbus function codes
+READ_HOLDING_REGISTERS = 3
+READ_INPUT_REGISTERS = 4
+WRITE_SINGLE_REGISTER = 6
+WRITE_MULTIPLE_REGISTERS = 16
+
+# Holding register writes
+# Modbus limits a single write request to 123 registers
+MAX_WRITE_BLOCK = 123
+# Writes per second, inverters store settings in flash memory
+WRITE_RATE = 1
+WRITE_BURST = 3
 
 
 PHOTOVOLTAICS_1 = "photovoltaics_1"
@@ -50,10 +76,29 @@ SYSTEM_PRODUCTION_TODAY = "system_production_today"
 SYSTEM_PRODUCTION_LIFETIME = "system_production_lifetime"
 SELF_CONSUMPTION = "self_consumption"
 
+REMOTE_ON_OFF = "remote_on_off"
+ACTIVE_POWER_RATE = "active_power_rate"
+SYSTEM_YEAR = "system_year"
+SYSTEM_MONTH = "system_month"
+SYSTEM_DAY = "system_day"
+SYSTEM_HOUR = "system_hour"
+SYSTEM_MINUTE = "system_minute"
+SYSTEM_SECOND = "system_second"
+EXPORT_LIMIT_MODE = "export_limit_mode"
+EXPORT_LIMIT_POWER_RATE = "export_limit_power_rate"
+GRID_FIRST_DISCHARGE_POWER_RATE = "grid_first_discharge_power_rate"
+GRID_FIRST_STOP_SOC = "grid_first_stop_soc"
+BATTERY_FIRST_CHARGE_POWER_RATE = "battery_first_charge_power_rate"
+BATTERY_FIRST_STOP_SOC = "battery_first_stop_soc"
+BATTERY_FIRST_AC_CHARGE = "battery_first_ac_charge"
+
 # Word type
 INT_BYTE = "int_byte"
 SINGLE_BYTE = "single_byte"
 DOUBLE_BYTE = "double_byte"
+# Holding register only
+SIGNED_BYTE = "signed_byte"
+TIME_OF_DAY = "time_of_day"
 
 # Unit of measurement
 ELECTRICAL_POTENTIAL_VOLT = "V"
@@ -65,6 +110,7 @@ ENERGY_KILO_WATT_HOUR = "kWh"
 REACTIVE_ENERGY_KILO_VAR_HOUR = "kvarh"
 FREQUENCY_HERTZ = "Hz"
 TEMP_CELSIUS = "°C"
+PERCENTAGE = "%"
 
 
 def create_value(name, pos, unit, desc, type=DOUBLE_BYTE, scale=0.1):
@@ -78,6 +124,40 @@ def create_value(name, pos, unit, desc, type=DOUBLE_BYTE, scale=0.1):
     }
 
 
+def default_interval(attr):
+    """Polling tier of an attribute, from the counter it reads."""
+    if attr["name"].endswith("_lifetime"):
+        return TIER_LIFETIME
+    if attr["name"].endswith("_today"):
+        return TIER_TODAY
+    return TIER_FAST
+
+
+def create_holding(
+    name,
+    pos,
+    unit,
+    desc,
+    type=INT_BYTE,
+    scale=1,
+    minimum=None,
+    maximum=None,
+    writable=True,
+):
+    """Creates a holding register value, minimum and maximum as scaled"""
+    return {
+        "name": name,
+        "pos": pos,
+        "type": type,
+        "unit": unit,
+        "description": desc,
+        "scale": scale,
+        "min": minimum,
+        "max": maximum,
+        "writable": writable,
+    }
+
+
 def create_template(name, unit, desc, template):
     """Creates a nice template value"""
     template = " ".join(template.split())
@@ -382,3 +462,142 @@ ATTRIBUTES = [
         "{consumption} if {export_to_grid} > 0 else {system_production}",
     ),
 ]
+
+ATTRIBUTES_BY_NAME = {attr["name"]: attr for attr in ATTRIBUTES}
+
+
+def _time_of_use(prefix, desc, pos):
+    """Start, stop and enable holding registers of a time of use slot."""
+    return [
+        create_holding(
+            f"{prefix}_start", pos, None, f"{desc} start", TIME_OF_DAY
+        ),
+        create_holding(
+            f"{prefix}_stop", pos + 1, None, f"{desc} stop", TIME_OF_DAY
+        ),
+        create_holding(
+            f"{prefix}_enabled",
+            pos + 2,
+            None,
+            f"{desc} enabled",
+            INT_BYTE,
+            1,
+            0,
+            1,
+        ),
+    ]
+
+
+HOLDING_ATTRIBUTES = [
+    create_holding(
+        REMOTE_ON_OFF, 0, None, "Remote on (1) or off (0)", INT_BYTE, 1, 0, 1
+    ),
+    create_holding(
+        ACTIVE_POWER_RATE,
+        3,
+        PERCENTAGE,
+        "Maximum output active power",
+        INT_BYTE,
+        1,
+        0,
+        100,
+    ),
+    create_holding(
+        SYSTEM_YEAR, 45, None, "System time year", INT_BYTE, 1, 2000, 2099
+    ),
+    create_holding(
+        SYSTEM_MONTH, 46, None, "System time month", INT_BYTE, 1, 1, 12
+    ),
+    create_holding(
+        SYSTEM_DAY, 47, None, "System time day", INT_BYTE, 1, 1, 31
+    ),
+    create_holding(
+        SYSTEM_HOUR, 48, None, "System time hour", INT_BYTE, 1, 0, 23
+    ),
+    create_holding(
+        SYSTEM_MINUTE, 49, None, "System time minute", INT_BYTE, 1, 0, 59
+    ),
+    create_holding(
+        SYSTEM_SECOND, 50, None, "System time second", INT_BYTE, 1, 0, 59
+    ),
+    create_holding(
+        EXPORT_LIMIT_MODE,
+        122,
+        None,
+        "Export limit, 0 disabled, 1 by RS485, 2 by RS232, 3 by CT",
+        INT_BYTE,
+        1,
+        0,
+        3,
+    ),
+    create_holding(
+        EXPORT_LIMIT_POWER_RATE,
+        123,
+        PERCENTAGE,
+        "Export limit power rate",
+        SIGNED_BYTE,
+        0.1,
+        -100,
+        100,
+    ),
+    create_holding(
+        GRID_FIRST_DISCHARGE_POWER_RATE,
+        1070,
+        PERCENTAGE,
+        "Discharge power rate when grid first",
+        INT_BYTE,
+        1,
+        0,
+        100,
+    ),
+    create_holding(
+        GRID_FIRST_STOP_SOC,
+        1071,
+        PERCENTAGE,
+        "Stop discharge state of charge when grid first",
+        INT_BYTE,
+        1,
+        0,
+        100,
+    ),
+    *_time_of_use("grid_first_1", "Grid first 1", 1080),
+    *_time_of_use("grid_first_2", "Grid first 2", 1083),
+    *_time_of_use("grid_first_3", "Grid first 3", 1086),
+    create_holding(
+        BATTERY_FIRST_CHARGE_POWER_RATE,
+        1090,
+        PERCENTAGE,
+        "Charge power rate when battery first",
+        INT_BYTE,
+        1,
+        0,
+        100,
+    ),
+    create_holding(
+        BATTERY_FIRST_STOP_SOC,
+        1091,
+        PERCENTAGE,
+        "Stop charge state of charge when battery first",
+        INT_BYTE,
+        1,
+        0,
+        100,
+    ),
+    create_holding(
+        BATTERY_FIRST_AC_CHARGE,
+        1092,
+        None,
+        "Charge from the grid when battery first",
+        INT_BYTE,
+        1,
+        0,
+        1,
+    ),
+    *_time_of_use("battery_first_1", "Battery first 1", 1100),
+    *_time_of_use("battery_first_2", "Battery first 2", 1103),
+    *_time_of_use("battery_first_3", "Battery first 3", 1106),
+]
+
+HOLDING_ATTRIBUTES_BY_NAME = {
+    attr["name"]: attr for attr in HOLDING_ATTRIBUTES
+}
@@ -0,0 +1,243 @@
+"""
+Derive energy deltas from the *_today and *_lifetime counters.
+
+The counters are double register values. The *_today counters reset
+around the local midnight of the inverter, and a read catching the two
+registers halfway through an update gives a value off by a multiple of
+65536 raw units. The CounterTracker turns successive readings into
+deltas that never go negative and leaves out such torn readings.
+"""
+import json
+import math
+import time
+
+from .const import ATTRIBUTES, DOUBLE_BYTE
+from .files import atomic_write
+from .template import compile_templates, template_inputs
+
+__all__ = [
+    "TORN",
+    "DECREASE",
+    "IMPLAUSIBLE",
+    "counter_attributes",
+    "CounterTracker",
+]
+
+# Reasons a reading is rejected
+TORN = "torn"
+DECREASE = "decrease"
+IMPLAUSIBLE = "implausible"
+
+
+def counter_attributes(attribute_defs=ATTRIBUTES):
+    """Names of the register counters in attribute definitions."""
+    return [
+        attr["name"]
+        for attr in attribute_defs
+        if attr.get("type") == DOUBLE_BYTE
+        and attr["name"].endswith(("_today", "_lifetime"))
+    ]
+
+
+class CounterTracker:
+    """
+    Energy deltas between readings of counters, kept across restarts.
+
+    A *_today counter going down is a reset when the local day changed
+    since the last reading, or within rollover seconds after midnight
+    to allow for the inverter clock. Other decreases, jumps of half a
+    carry into the high register (32768 raw units) or more, and
+    increases faster than max_power kW are rejected and the previous
+    reading kept. A counter rejected confirm times in a row at
+    consistent values is taken at its new value, without a delta, as
+    after a replaced inverter.
+
+    Templates of counters, such as consumption_today, get their delta
+    from the deltas of their inputs.
+
+    With a path, the last readings are saved to that JSON file at most
+    every save_interval seconds, and loaded on start, so a restart
+    continues from them instead of starting over.
+    """
+
+    def __init__(
+        self,
+        attribute_defs=ATTRIBUTES,
+        names=None,
+        path=None,
+        utc_offset=None,
+        rollover=3600,
+        max_power=None,
+        confirm=3,
+        save_interval=60,
+    ):
+        if names is None:
+            names = counter_attributes(attribute_defs)
+        self.names = tuple(names)
+        defs = {attr["name"]: attr for attr in attribute_defs}
+        # Raw units of half a carry into the high register, per counter
+        self._torn = {
+            name: 0x8000 * (defs[name].get("scale") or 1)
+            for name in self.names
+        }
+        self._templates = compile_templates(
+            _counter_templates(attribute_defs, self.names), set(self.names)
+        )
+        self.path = path
+        self.utc_offset = utc_offset
+        self.rollover = rollover
+        self.max_power = max_power
+        self.confirm = confirm
+        self.save_interval = save_interval
+
+        # Last accepted reading per counter, {"value", "time"}
+        self._last = {}
+        # Rejected readings in a row per counter, [value, count]
+        self._pending = {}
+        self._rejected = {}
+        self._saved = 0.0
+        if path is not None:
+            self._load()
+
+    def _day(self, timestamp):
+        offset = self.utc_offset
+        if offset is None:
+            offset = time.localtime(timestamp).tm_gmtoff
+        return int((timestamp + offset) // 86400)
+
+    def _since_midnight(self, timestamp):
+        offset = self.utc_offset
+        if offset is None:
+            offset = time.localtime(timestamp).tm_gmtoff
+        return (timestamp + offset) % 86400
+
+    def update(self, data, timestamp=None):
+        """
+        Add the counter readings of a poll, a data dict or Snapshot.
+
+        timestamp is the time.time() of the readings. By default it is
+        the timestamp of a Snapshot, also wall-clock time, so replayed
+        snapshots fall on the day they were read, or now when there is
+        none.
+
+        Returns the delta per counter since its last accepted reading,
+        and per counter template. Counters without a reading, with
+        their first reading or with a rejected reading are left out.
+        """
+        if timestamp is None:
+            timestamp = getattr(data, "timestamp", math.nan)
+            if not math.isfinite(timestamp):
+                timestamp = time.time()
+
+        deltas = {}
+        for name in self.names:
+            value = data.get(name, math.nan)
+            if value is None or value != value:
+                continue
+            last = self._last.get(name)
+            if last is None:
+                self._accept(name, value, timestamp)
+                continue
+            delta, reason = self._delta(name, last, value, timestamp)
+            if reason is None:
+                self._accept(name, value, timestamp)
+                deltas[name] = round(delta, 6)
+            else:
+                self._reject(name, value, timestamp, reason)
+
+        for templ in self._templates:
+            if all(field in deltas for field in templ.inputs):
+                deltas[templ.name] = templ.evaluate(deltas)
+
+        if self.path is not None and timestamp - self._saved >= (
+            self.save_interval
+        ):
+            self.save(timestamp)
+        return deltas
+
+    def _delta(self, name, last, value, timestamp):
+        """Delta from the last reading, and why it is rejected or None."""
+        delta = value - last["value"]
+        if abs(delta) >= self._torn[name]:
+            return delta, TORN
+        if delta < 0:
+            if name.endswith("_today") and (
+                self._day(timestamp) != self._day(last["time"])
+                or self._since_midnight(timestamp) < self.rollover
+            ):
+                # Counted from zero since the reset
+                return value, None
+            return delta, DECREASE
+        if self.max_power is not None:
+            hours = (timestamp - last["time"]) / 3600
+            # Allow for the resolution of the counter
+            if delta > self.max_power * hours + 0.1:
+                return delta, IMPLAUSIBLE
+        return delta, None
+
+    def _accept(self, name, value, timestamp):
+        self._last[name] = {"value": value, "time": timestamp}
+        self._pending.pop(name, None)
+
+    def _reject(self, name, value, timestamp, reason):
+        counts = self._rejected.setdefault(name, {})
+        counts[reason] = counts.get(reason, 0) + 1
+        pending = self._pending.get(name)
+        if pending is not None and abs(value - pending[0]) < self._torn[name]:
+            pending[0] = value
+            pending[1] += 1
+        else:
+            pending = [value, 1]
+            self._pending[name] = pending
+        if pending[1] >= self.confirm:
+            # The counter really moved, continue from its new value
+            self._accept(name, value, timestamp)
+
+    def get_rejected(self):
+        """Return the number of rejected readings per counter and reason."""
+        return {name: dict(counts) for name, counts in self._rejected.items()}
+
+    def get_last(self):
+        """Return the last accepted reading per counter."""
+        return {name: dict(last) for name, last in self._last.items()}
+
+    def _load(self):
+        try:
+            with open(self.path) as file:
+                state = json.load(file)
+        except (OSError, ValueError):
+            return
+        self._last = {
+            name: last
+            for name, last in state.get("last", {}).items()
+            if name in self.names
+        }
+
+    def save(self, timestamp=None):
+        """Write the last readings to the state file."""
+        if self.path is None:
+            return
+        with atomic_write(self.path) as file:
+            json.dump({"last": self._last}, file)
+        self._saved = time.time() if timestamp is None else timestamp
+
+
+def _counter_templates(attribute_defs, names):
+    """Templates of counters only using the names or each other."""
+    templates = {
+        attr["name"]: attr
+        for attr in attribute_defs
+        if "template" in attr
+        and attr["name"].endswith(("_today", "_lifetime"))
+    }
+    changed = True
+    while changed:
+        changed = False
+        for name, attr in list(templates.items()):
+            if not all(
+                field in names or field in templates
+                for field in template_inputs(attr["template"])
+            ):
+                del templates[name]
+                changed = True
+    return list(templates.values())
@@ -0,0 +1,108 @@
+"""Decode all values of a register block at once."""
+import struct
+
+from .const import DOUBLE_BYTE, INT_BYTE, SINGLE_BYTE
+
+__all__ = ["BlockDecoder"]
+
+_FORMATS = {INT_BYTE: "H", SINGLE_BYTE: "H", DOUBLE_BYTE: "I"}
+
+
+class BlockDecoder:
+    """
+    Decoder for the values of one read request.
+
+    The offsets, types and scales of the values are turned into a
+    single struct format when the decoder is created, a block of
+    registers is then unpacked with one call and scaled in one pass.
+    """
+
+    def __init__(self, pos, length, values):
+        self.pos = pos
+        self.length = length
+        values = sorted(values, key=lambda x: x["pos"])
+        self.names = tuple(value["name"] for value in values)
+        # None keeps the raw register value
+        self._scales = tuple(
+            None if value["type"] == INT_BYTE else float(value["scale"])
+            for value in values
+        )
+        # Values of unknown type decode to 0
+        self._zeros = [
+            index
+            for index, value in enumerate(values)
+            if value["type"] not in _FORMATS
+        ]
+        self._words = struct.Struct(f">{length}H")
+
+        fmt = ">"
+        cursor = pos
+        for value in values:
+            code = _FORMATS.get(value["type"], "H")
+            if value["pos"] < cursor:
+                # Values share registers, no single format fits
+                fmt = None
+                break
+            if value["pos"] > cursor:
+                fmt += f"{(value['pos'] - cursor) * 2}x"
+            fmt += code
+            cursor = value["pos"] + (2 if code == "I" else 1)
+        if fmt is not None and cursor > pos + length:
+            raise ValueError(f"Values do not fit in block at {pos}.")
+
+        if fmt is None:
+            self._struct = None
+            self._items = [
+                (
+                    struct.Struct(">" + _FORMATS.get(value["type"], "H")),
+                    (value["pos"] - pos) * 2,
+                )
+                for value in values
+            ]
+        else:
+            fmt += f"{(pos + length - cursor) * 2}x"
+            self._struct = struct.Struct(fmt)
+
+    def _scale(self, raw):
+        values = [
+            val if scale is None else round(val * scale, 1)
+            for val, scale in zip(raw, self._scales)
+        ]
+        for index in self._zeros:
+            values[index] = 0
+        return values
+
+    def _unpack(self, payload, offset=0):
+        if self._struct is not None:
+            return self._struct.unpack_from(payload, offset)
+        return [
+            item.unpack_from(payload, offset + start)[0]
+            for item, start in self._items
+        ]
+
+    def decode_bytes(self, payload, offset=0):
+        """Decode the big endian register bytes of a block."""
+        return self._scale(self._unpack(payload, offset))
+
+    def decode(self, registers):
+        """Decode a list of register values."""
+        return self.decode_bytes(self._words.pack(*registers))
+
+    def decode_into(self, registers, data):
+        """Decode a list of register values into the data dict."""
+        data.update(zip(self.names, self.decode(registers)))
+        return data
+
+    def decode_many(self, buffer):
+        """
+        Decode back to back blocks of register bytes.
+
+        Yields the values of every block, as from decode_bytes.
+        """
+        size = self.length * 2
+        if self._struct is not None and len(buffer) % size == 0:
+            for raw in self._struct.iter_unpack(buffer):
+                yield self._scale(raw)
+            return
+        for offset in range(0, len(buffer) - size + 1, size):
+            yield self._scale(self._unpack(buffer, offset))
@@ -0,0 +1,192 @@
+"""
+Discover what a connected inverter supports and remember it.
+
+A capability profile is a dict:
+
+    serial_number   of the inverter
+    firmware        and model_number, as read from the inverter
+    baudrate        fastest baud rate that answered
+    supported       names of the register attributes that answered
+    unsupported     names of the register attributes that did not
+    probed_at       time.time() of the discovery
+
+Profiles are kept in a JSON file, by serial number, together with the
+serial number last found at every port and address.
+"""
+import json
+import os
+import time
+
+from .const import ATTRIBUTES, DEFAULT_ADDRESS, DEFAULT_BAUDRATE
+from .files import atomic_write
+from .growatt import GrowattClient, ModbusException, create_modbus_client
+from .planner import plan_registers, value_width
+
+__all__ = [
+    "DEFAULT_PROFILE_CACHE",
+    "BAUDRATES",
+    "load_profile",
+    "save_profile",
+    "async_probe_attributes",
+    "async_probe_baudrate",
+    "async_discover",
+]
+
+DEFAULT_PROFILE_CACHE = os.path.join(
+    os.path.expanduser("~"), ".cache", "growatt_client", "profiles.json"
+)
+
+BAUDRATES = (115200, 38400, 19200, DEFAULT_BAUDRATE)
+
+
+def _read_cache(path):
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {"profiles": {}, "ports": {}}
+
+
+def _write_cache(path, cache):
+    with atomic_write(path) as file:
+        json.dump(cache, file, indent=2, sort_keys=True)
+
+
+def _port_key(port, address):
+    return f"{port}:{address}"
+
+
+def load_profile(
+    serial_number=None,
+    port=None,
+    address=DEFAULT_ADDRESS,
+    path=DEFAULT_PROFILE_CACHE,
+):
+    """
+    Load a profile by serial number, or by the port and address it was
+    last discovered at. Returns None when there is none.
+    """
+    cache = _read_cache(path)
+    if serial_number is None:
+        serial_number = cache["ports"].get(_port_key(port, address))
+    return cache["profiles"].get(serial_number)
+
+
+def save_profile(
+    profile, port=None, address=DEFAULT_ADDRESS, path=DEFAULT_PROFILE_CACHE
+):
+    """Save a profile, replacing any earlier one of the same inverter."""
+    cache = _read_cache(path)
+    cache["profiles"][profile["serial_number"]] = profile
+    if port is not None:
+        cache["ports"][_port_key(port, address)] = profile["serial_number"]
+    _write_cache(path, cache)
+
+
+async def _async_answers(client, address, pos, length):
+    try:
+        registers = await client.read_input_registers(
+            pos, length, slave=address
+        )
+    except Exception:
+        return False
+    return not registers.isError()
+
+
+async def async_probe_attributes(
+    client, address=DEFAULT_ADDRESS, attribute_defs=ATTRIBUTES
+):
+    """
+    Find the register attributes an inverter answers for.
+
+    Every planned request is tried once, the attributes of requests
+    that fail are then tried one by one. The client must be connected.
+    Returns the supported and the unsupported attribute names.
+    """
+    values = [attr for attr in attribute_defs if "pos" in attr]
+    supported = []
+    unsupported = []
+    for group in plan_registers(values):
+        if await _async_answers(
+            client, address, group["pos"], group["length"]
+        ):
+            supported.extend(v["name"] for v in group["values"])
+            continue
+        for value in group["values"]:
+            if await _async_answers(
+                client, address, value["pos"], value_width(value)
+            ):
+                supported.append(value["name"])
+            else:
+                unsupported.append(value["name"])
+    return supported, unsupported
+
+
+async def async_probe_baudrate(client_factory, address, baudrates=BAUDRATES):
+    """
+    Find the fastest baud rate the inverter answers at.
+
+    client_factory returns a Modbus client for a baud rate.
+    Returns None when no baud rate answers.
+    """
+    for baudrate in sorted(baudrates, reverse=True):
+        client = client_factory(baudrate)
+        try:
+            if not await client.connect():
+                continue
+            registers = await client.read_holding_registers(
+                0, 1, slave=address
+            )
+            if not registers.isError():
+                return baudrate
+        except Exception:
+            pass
+        finally:
+            await client.close()
+    return None
+
+
+async def async_discover(
+    port,
+    address=DEFAULT_ADDRESS,
+    baudrates=BAUDRATES,
+    attribute_defs=ATTRIBUTES,
+    path=DEFAULT_PROFILE_CACHE,
+    client_factory=None,
+):
+    """
+    Discover the baud rate and attributes of an inverter and save them.
+
+    Pass path=None to not save the profile. Returns the profile.
+    """
+    if client_factory is None:
+
+        def client_factory(baudrate):
+            return create_modbus_client(port, baudrate=baudrate)
+
+    baudrate = await async_probe_baudrate(client_factory, address, baudrates)
+    if baudrate is None:
+        raise ModbusException(f"No answer from inverter {address} on {port}.")
+
+    modbus_client = client_factory(baudrate)
+    client = GrowattClient(
+        port, address, attributes=[], persistent=True, client=modbus_client
+    )
+    async with client:
+        await client.update_hardware_info()
+        supported, unsupported = await async_probe_attributes(
+            modbus_client, address, attribute_defs
+        )
+
+    profile = {
+        "serial_number": client.get_serial_number(),
+        "firmware": client.get_firmware(),
+        "model_number": client.get_model_number(),
+        "baudrate": baudrate,
+        "supported": supported,
+        "unsupported": unsupported,
+        "probed_at": time.time(),
+    }
+    if path is not None:
+        save_profile(profile, port, address, path)
+    return profile
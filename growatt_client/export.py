@@ -0,0 +1,214 @@
+"""
+Write polled data in batches to compressed columnar chunk files.
+
+Chunks are partitioned by UTC day or hour into directories, and every
+chunk file holds:
+
+    magic           b"GWCC"
+    header length   uint32
+    header          JSON, the columns with name, unit, scale and
+                    description, the number of rows and the codec
+    per column      uint32 length and the zlib compressed float64
+                    values, timestamps first
+
+All numbers are little endian. Chunks are written to a temporary file
+and renamed, so a chunk is either complete or not there.
+"""
+import json
+import os
+import struct
+import sys
+import time
+import zlib
+from array import array
+
+from .const import ATTRIBUTES
+from .files import atomic_write
+from .growatt import ModbusException
+from .recording import ReplayClient, RegisterRecording
+from .snapshot import NAN, Snapshot
+
+__all__ = [
+    "PARTITIONS",
+    "ColumnarWriter",
+    "read_chunk",
+    "iter_chunks",
+    "async_export_recording",
+]
+
+MAGIC = b"GWCC"
+PARTITIONS = {"day": "%Y-%m-%d", "hour": "%Y-%m-%d/%H"}
+
+_LENGTH = struct.Struct("<I")
+
+
+def _to_bytes(values):
+    if sys.byteorder != "little":
+        values = array("d", values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _from_bytes(data):
+    values = array("d")
+    values.frombytes(data)
+    if sys.byteorder != "little":
+        values.byteswap()
+    return values
+
+
+class ColumnarWriter:
+    """
+    Batch snapshots and write them as columnar chunk files.
+
+    A chunk is written when batch_size rows are buffered, when a row
+    falls in another partition than the buffered ones, and on flush().
+    """
+
+    def __init__(
+        self,
+        directory,
+        names,
+        attribute_defs=ATTRIBUTES,
+        batch_size=3600,
+        partition="day",
+        level=6,
+    ):
+        self._directory = directory
+        self._names = tuple(names)
+        self._batch_size = batch_size
+        self._format = PARTITIONS[partition]
+        self._level = level
+
+        defs = {attr["name"]: attr for attr in attribute_defs}
+        self._columns = []
+        for name in self._names:
+            attr = defs.get(name, {})
+            self._columns.append(
+                {
+                    "name": name,
+                    "unit": attr.get("unit"),
+                    "scale": attr.get("scale"),
+                    "description": attr.get("description"),
+                }
+            )
+
+        self._timestamps = array("d")
+        self._values = [array("d") for _ in self._names]
+        self._partition = None
+
+    def append(self, data, timestamp=None):
+        """Append a data dict or Snapshot, timestamp in epoch seconds."""
+        if timestamp is None:
+            timestamp = time.time()
+        partition = time.strftime(self._format, time.gmtime(timestamp))
+        if partition != self._partition:
+            self.flush()
+            self._partition = partition
+
+        if isinstance(data, Snapshot) and data.schema.names == self._names:
+            for column, value in zip(self._values, data.values):
+                column.append(value)
+        else:
+            get = data.get
+            for column, name in zip(self._values, self._names):
+                column.append(get(name, NAN))
+        self._timestamps.append(timestamp)
+
+        if len(self._timestamps) >= self._batch_size:
+            self.flush()
+
+    def flush(self):
+        """Write the buffered rows, returns the chunk path or None."""
+        if not self._timestamps:
+            return None
+        directory = os.path.join(self._directory, self._partition)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"chunk-{self._timestamps[0]:.3f}.gwc")
+
+        header = json.dumps(
+            {
+                "columns": self._columns,
+                "rows": len(self._timestamps),
+                "codec": "zlib",
+            }
+        ).encode()
+        parts = [MAGIC, _LENGTH.pack(len(header)), header]
+        for column in [self._timestamps] + self._values:
+            data = zlib.compress(_to_bytes(column), self._level)
+            parts.append(_LENGTH.pack(len(data)))
+            parts.append(data)
+
+        with atomic_write(path, "wb", fsync=True) as file:
+            file.write(b"".join(parts))
+
+        self._timestamps = array("d")
+        self._values = [array("d") for _ in self._names]
+        return path
+
+    def close(self):
+        self.flush()
+
+
+def read_chunk(path):
+    """Read a chunk file, returns (columns, timestamps, values by name)."""
+    with open(path, "rb") as file:
+        content = file.read()
+    if content[:4] != MAGIC:
+        raise ValueError(f"{path} is not a columnar chunk.")
+    offset = 4
+    (length,) = _LENGTH.unpack_from(content, offset)
+    offset += _LENGTH.size
+    header = json.loads(content[offset : offset + length])
+    offset += length
+
+    arrays = []
+    for _ in range(len(header["columns"]) + 1):
+        (length,) = _LENGTH.unpack_from(content, offset)
+        offset += _LENGTH.size
+        arrays.append(
+            _from_bytes(zlib.decompress(content[offset : offset + length]))
+        )
+        offset += length
+    values = {
+        column["name"]: data
+        for column, data in zip(header["columns"], arrays[1:])
+    }
+    return header["columns"], arrays[0], values
+
+
+def iter_chunks(directory):
+    """Yield the chunk files below a directory, oldest first."""
+    paths = []
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if name.startswith("chunk-") and name.endswith(".gwc"):
+                paths.append((float(name[6:-4]), os.path.join(root, name)))
+    for _, path in sorted(paths):
+        yield path
+
+
+async def async_export_recording(recording, writer, client_factory):
+    """
+    Decode a register recording and append it to a writer.
+
+    client_factory gets a ReplayClient and returns the GrowattClient to
+    decode with, so recordings are decoded with current definitions.
+    Rows get the timestamp of their last register read.
+    """
+    if not isinstance(recording, RegisterRecording):
+        recording = RegisterRecording(recording)
+    replay = ReplayClient(recording)
+    client = client_factory(replay)
+    rows = 0
+    while not replay.exhausted:
+        try:
+            data = await client.async_update()
+        except ModbusException:
+            if replay.exhausted:
+                break
+            raise
+        writer.append(data, replay.timestamp)
+        rows += 1
+    writer.flush()
+    return rows
@@ -0,0 +1,377 @@
+"""
+Poll inverters and serve their latest data over HTTP.
+
+    python -m growatt_client.exporter /dev/ttyUSB0:1,2 --listen :9105
+
+One process owns the serial ports and polls every inverter once per
+interval, any number of readers get the data from memory:
+
+    GET /data       latest data per port and address, as JSON
+    GET /metrics    the same, and the poll metrics, for Prometheus
+    GET /health     health of every port, as JSON
+
+With --shared, the latest data is also published as shared snapshots,
+for readers on the same host that read memory instead of HTTP.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import signal
+import sys
+
+from .const import ATTRIBUTES, DEFAULT_ADDRESS
+from .fleet import HEALTH_FAILED, GrowattFleet
+from .maps import load_register_maps
+from .metrics import InMemoryMetrics, _labels, render_prometheus
+from .shared import (
+    DEFAULT_SHARED_DIR,
+    PortLock,
+    SharedSnapshotWriter,
+    shared_path,
+)
+from .snapshot import SnapshotSchema
+
+__all__ = ["DEFAULT_LISTEN", "GrowattExporter", "main"]
+
+_LOGGER = logging.getLogger(__name__)
+_LOGGER.addHandler(logging.NullHandler())
+
+DEFAULT_LISTEN = "127.0.0.1:9105"
+
+_STATUS = {200: "OK", 404: "Not Found", 405: "Method Not Allowed"}
+
+
+class GrowattExporter:
+    """
+    Poll a GrowattFleet on a fixed interval and serve the latest data.
+
+    Responses are rendered once per poll and then served from memory,
+    so readers never cause traffic on the serial lines.
+    """
+
+    def __init__(
+        self,
+        fleet,
+        interval=10,
+        metrics=None,
+        attribute_defs=ATTRIBUTES,
+        logger=None,
+        shared_dir=None,
+    ):
+        self._logger = _LOGGER if logger is None else logger
+        self._fleet = fleet
+        self._interval = interval
+        self._metrics = metrics
+        self._defs = {attr["name"]: attr for attr in attribute_defs}
+        # Bumped on every poll, responses are rendered once per version
+        self._version = 0
+        self._rendered = {}
+        self._shared_dir = shared_dir
+        # Shared snapshot writer per port and address
+        self._writers = {}
+
+    async def async_poll(self):
+        """Poll every inverter once."""
+        await self._fleet.async_update_all()
+        self._version += 1
+        if self._shared_dir is not None:
+            self._publish()
+
+    def _publish(self):
+        """
+        Write the latest data to the shared snapshots.
+
+        A snapshot that cannot be written is logged, the poll itself
+        succeeded and the other snapshots are still written.
+        """
+        timestamps = self._fleet.get_timestamps()
+        for key, data in self._fleet.get_latest().items():
+            writer = self._writers.get(key)
+            try:
+                if writer is None or writer.schema.names != tuple(data):
+                    if writer is not None:
+                        del self._writers[key]
+                        writer.close()
+                    writer = SharedSnapshotWriter(
+                        shared_path(*key, self._shared_dir),
+                        SnapshotSchema(data),
+                    )
+                    self._writers[key] = writer
+                writer.write(data, timestamps[key])
+            except OSError as error:
+                self._logger.warning(
+                    f"Publishing {key[0]}:{key[1]} failed: {error!r}"
+                )
+
+    def close_shared(self):
+        """Close and remove the shared snapshots."""
+        for writer in self._writers.values():
+            writer.close()
+        self._writers.clear()
+
+    async def async_poll_forever(self):
+        """Poll every interval seconds until cancelled."""
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        tick = 0
+        while True:
+            try:
+                await self.async_poll()
+            except Exception as error:
+                self._logger.warning(f"Poll failed: {error!r}")
+            tick = max(
+                tick + 1, int((loop.time() - start) / self._interval) + 1
+            )
+            await asyncio.sleep(
+                max(0, start + tick * self._interval - loop.time())
+            )
+
+    def _inverters(self):
+        """Latest data per port and address, with the time and serial."""
+        timestamps = self._fleet.get_timestamps()
+        for (port, address), data in sorted(self._fleet.get_latest().items()):
+            inverter = self._fleet.get_bus(port).get_inverter(address)
+            yield port, address, inverter, timestamps[(port, address)], data
+
+    def render_json(self):
+        result = {}
+        for port, address, inverter, timestamp, data in self._inverters():
+            result.setdefault(port, {})[str(address)] = {
+                "serial_number": inverter.get_serial_number(),
+                "timestamp": timestamp,
+                "data": {
+                    name: value
+                    for name, value in data.items()
+                    if value == value
+                },
+            }
+        return json.dumps(result)
+
+    def render_health(self):
+        return json.dumps(self._fleet.get_health())
+
+    def render_metrics(self):
+        """The latest data and poll metrics in the Prometheus format."""
+        lines = []
+        samples = {}
+        for port, address, inverter, timestamp, data in self._inverters():
+            labels = (
+                ("port", port),
+                ("address", address),
+                ("serial_number", inverter.get_serial_number()),
+            )
+            samples.setdefault("last_poll_timestamp_seconds", []).append(
+                (labels, timestamp)
+            )
+            for name, value in data.items():
+                if value == value and not math.isinf(value):
+                    samples.setdefault(name, []).append((labels, value))
+
+        for name, values in samples.items():
+            attr = self._defs.get(name)
+            if attr is not None:
+                unit = f" ({attr['unit']})" if attr.get("unit") else ""
+                lines.append(
+                    f"# HELP growatt_{name} {attr['description']}{unit}"
+                )
+            lines.append(f"# TYPE growatt_{name} gauge")
+            for labels, value in values:
+                lines.append(f"growatt_{name}{_labels(labels)} {value}")
+
+        lines.append("# TYPE growatt_port_up gauge")
+        for port, health in sorted(self._fleet.get_health().items()):
+            up = 0 if health["state"] == HEALTH_FAILED else 1
+            lines.append(f"growatt_port_up{_labels((('port', port),))} {up}")
+
+        text = "\n".join(lines) + "\n"
+        if self._metrics is not None:
+            text += render_prometheus(self._metrics)
+        return text
+
+    def _render(self, path):
+        """Content type and body of a path, None when not found."""
+        renderers = {
+            "/data": ("application/json", self.render_json),
+            "/health": ("application/json", self.render_health),
+            "/metrics": (
+                "text/plain; version=0.0.4; charset=utf-8",
+                self.render_metrics,
+            ),
+        }
+        if path not in renderers:
+            return None
+        if self._rendered.get("version") != self._version:
+            self._rendered = {"version": self._version}
+        if path not in self._rendered:
+            content_type, render = renderers[path]
+            self._rendered[path] = (content_type, render().encode())
+        return self._rendered[path]
+
+    async def async_handle(self, reader, writer):
+        """Answer one HTTP request."""
+        try:
+            request = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), 5)
+        except (
+            asyncio.TimeoutError,
+            asyncio.IncompleteReadError,
+            asyncio.LimitOverrunError,
+        ):
+            writer.close()
+            return
+
+        method, _, rest = request.decode("latin-1").partition(" ")
+        path = rest.partition(" ")[0].partition("?")[0]
+        content_type, body = "text/plain", b""
+        if method not in ("GET", "HEAD"):
+            status = 405
+        else:
+            rendered = self._render(path)
+            if rendered is None:
+                status = 404
+            else:
+                status = 200
+                content_type, body = rendered
+
+        writer.write(
+            (
+                f"HTTP/1.1 {status} {_STATUS[status]}\r\n"
+                f"Content-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                "Connection: close\r\n\r\n"
+            ).encode()
+        )
+        if method != "HEAD":
+            writer.write(body)
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+        writer.close()
+
+    async def async_run(self, host, port):
+        """Poll and serve until cancelled."""
+        server = await asyncio.start_server(self.async_handle, host, port)
+        self._logger.info(f"Serving on {host}:{port}")
+        try:
+            async with server:
+                await self.async_poll_forever()
+        finally:
+            self.close_shared()
+            await self._fleet.async_close()
+
+
+def _inverter_spec(text):
+    """Port and addresses of PORT[:ADDRESS,ADDRESS...]."""
+    port, _, addresses = text.rpartition(":")
+    if not port or not addresses.replace(",", "").isdigit():
+        return text, [DEFAULT_ADDRESS]
+    return port, [int(address) for address in addresses.split(",")]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "inverters",
+        nargs="+",
+        type=_inverter_spec,
+        help="serial port and inverter addresses, as /dev/ttyUSB0:1,2",
+    )
+    parser.add_argument(
+        "--listen", default=DEFAULT_LISTEN, help="host:port to serve on"
+    )
+    parser.add_argument(
+        "--interval", type=float, default=10, help="seconds between polls"
+    )
+    parser.add_argument(
+        "--attributes", nargs="*", help="attributes to poll, default all"
+    )
+    parser.add_argument(
+        "--maps",
+        nargs="*",
+        metavar="PATH",
+        help="register map files or directories, picked per inverter",
+    )
+    parser.add_argument(
+        "--simulate",
+        action="store_true",
+        help="poll simulated inverters instead of the serial ports",
+    )
+    parser.add_argument(
+        "--shared",
+        nargs="?",
+        const=DEFAULT_SHARED_DIR or "",
+        metavar="DIR",
+        help="also publish shared snapshots, by default in /dev/shm",
+    )
+    parser.add_argument(
+        "--no-lock",
+        action="store_true",
+        help="do not hold a port lock on the serial ports",
+    )
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO)
+    host, _, listen_port = args.listen.rpartition(":")
+
+    register_maps = None
+    if args.maps is not None:
+        register_maps = load_register_maps(*args.maps)
+
+    metrics = InMemoryMetrics()
+    fleet = GrowattFleet(metrics=metrics)
+    for port, addresses in args.inverters:
+        client = None
+        port_lock = None
+        if args.simulate:
+            from .simulator import (
+                InverterSimulator,
+                SimulatedBus,
+                SimulatorClient,
+            )
+
+            client = SimulatorClient(
+                SimulatedBus([InverterSimulator(a) for a in addresses]),
+                baudrate=None,
+            )
+        elif not args.no_lock:
+            port_lock = PortLock(port)
+        bus = fleet.add_port(port, client, port_lock)
+        for address in addresses:
+            bus.add_inverter(
+                address,
+                attributes=args.attributes,
+                register_maps=register_maps,
+            )
+
+    if args.shared:
+        try:
+            os.makedirs(args.shared, exist_ok=True)
+        except OSError as error:
+            parser.error(f"cannot create {args.shared}: {error.strerror}")
+
+    exporter = GrowattExporter(
+        fleet, args.interval, metrics, shared_dir=args.shared
+    )
+
+    async def run():
+        task = asyncio.ensure_future(
+            exporter.async_run(host or None, int(listen_port))
+        )
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, task.cancel)
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    asyncio.run(run())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
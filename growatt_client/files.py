@@ -0,0 +1,45 @@
+"""Replace files atomically, through a temporary file of their own."""
+import contextlib
+import os
+import tempfile
+
+__all__ = ["atomic_write"]
+
+
+def _umask():
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+
+@contextlib.contextmanager
+def atomic_write(path, mode="w", fsync=False):
+    """
+    Open a new file to replace path with once the block is done.
+
+    Every writer gets a temporary file of its own next to path, so
+    writers never mix their content and readers only ever see a
+    complete file. The directory is created when missing. With fsync
+    the content is on disk before path is replaced. When the block
+    raises, the temporary file is removed and path left as it was.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    fd, temp = tempfile.mkstemp(
+        suffix=".tmp",
+        prefix=os.path.basename(path) + ".",
+        dir=directory or None,
+    )
+    try:
+        # The permissions open() would give, not those of mkstemp
+        os.chmod(temp, 0o666 & ~_umask())
+        with os.fdopen(fd, mode) as file:
+            yield file
+            if fsync:
+                file.flush()
+                os.fsync(file.fileno())
+        os.replace(temp, path)
+    except BaseException:
+        os.remove(temp)
+        raise
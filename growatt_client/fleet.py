@@ -0,0 +1,198 @@
+"""
+Poll inverters on many serial ports at the same time.
+"""
+import asyncio
+import logging
+import time
+
+from .bus import GrowattBus
+
+__all__ = [
+    "HEALTH_OK",
+    "HEALTH_DEGRADED",
+    "HEALTH_FAILED",
+    "PortHealth",
+    "GrowattFleet",
+]
+
+_LOGGER = logging.getLogger(__name__)
+_LOGGER.addHandler(logging.NullHandler())
+
+# Port health states
+HEALTH_OK = "ok"
+HEALTH_DEGRADED = "degraded"
+HEALTH_FAILED = "failed"
+
+
+class PortHealth:
+    """Health of the inverters polled on one port."""
+
+    def __init__(self):
+        self.state = HEALTH_OK
+        self.failures = 0
+        self.last_success = None
+        self.last_error = None
+        self.retry_at = 0.0
+
+    def as_dict(self):
+        error = self.last_error
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "last_success": self.last_success,
+            "last_error": None if error is None else str(error),
+        }
+
+
+class GrowattFleet:
+    """
+    Poll a GrowattBus per serial port, all ports concurrently.
+
+    Every sweep polls the ports side by side, a port taking longer than
+    port_timeout is abandoned for that sweep so it does not hold up the
+    others. A port failing failures_to_fail sweeps in a row is failed and
+    only tried again after retry_delay seconds, doubling up to
+    retry_delay_max. A limiter shared by all buses sets a global rate
+    limit of requests.
+    """
+
+    def __init__(
+        self,
+        port_timeout=10,
+        failures_to_fail=3,
+        retry_delay=30,
+        retry_delay_max=600,
+        limiter=None,
+        metrics=None,
+        logger=None,
+    ):
+        """Initialize."""
+        self._logger = _LOGGER if logger is None else logger
+
+        self._port_timeout = port_timeout
+        self._failures_to_fail = failures_to_fail
+        self._retry_delay = retry_delay
+        self._retry_delay_max = retry_delay_max
+        self._limiter = limiter
+        self._metrics = metrics
+        self._buses = {}
+        self._health = {}
+        # Last data per (port, address) and when it was read
+        self._latest = {}
+        self._timestamps = {}
+
+    def add_port(self, port, client=None, port_lock=None):
+        """
+        Add a serial port and return its GrowattBus.
+
+        A PortLock is held by the bus while the port is open, so other
+        processes using the lock leave the port alone.
+        """
+        if port in self._buses:
+            raise ValueError(f"Port {port} is already in the fleet.")
+        bus = GrowattBus(
+            port,
+            logger=self._logger,
+            metrics=self._metrics,
+            limiter=self._limiter,
+            client=client,
+            port_lock=port_lock,
+        )
+        self._buses[port] = bus
+        self._health[port] = PortHealth()
+        return bus
+
+    def get_bus(self, port):
+        return self._buses[port]
+
+    def get_health(self):
+        """Return the health of every port."""
+        return {
+            port: health.as_dict() for port, health in self._health.items()
+        }
+
+    def get_latest(self):
+        """Return the last data read per (port, address)."""
+        return dict(self._latest)
+
+    def get_timestamps(self):
+        """Return the time.time() the data per (port, address) was read."""
+        return dict(self._timestamps)
+
+    async def async_update_all(self):
+        """
+        Poll all ports concurrently.
+
+        Returns the data per port and address of this sweep, with the
+        exception in place of the data for inverters that failed.
+        Ports that timed out or are waiting to be retried are left out.
+        """
+        now = time.monotonic()
+        ports = [
+            port
+            for port, health in self._health.items()
+            if health.retry_at <= now
+        ]
+        results = await asyncio.gather(
+            *(self._async_update_port(port) for port in ports)
+        )
+        return {
+            port: result
+            for port, result in zip(ports, results)
+            if result is not None
+        }
+
+    async def _async_update_port(self, port):
+        health = self._health[port]
+        try:
+            result = await asyncio.wait_for(
+                self._buses[port].async_update_all(return_exceptions=True),
+                self._port_timeout,
+            )
+        except asyncio.TimeoutError as error:
+            # The abandoned request may still be answered, the answer
+            # would be taken for the next one unless the port is reopened
+            await self._buses[port].async_close()
+            self._failed(port, health, error)
+            return None
+        except Exception as error:
+            # Whatever fails on one port, the other ports are still polled
+            self._failed(port, health, error)
+            return None
+
+        errors = [r for r in result.values() if isinstance(r, Exception)]
+        if len(errors) == len(result) and errors:
+            self._failed(port, health, errors[0])
+        else:
+            health.failures = 0
+            health.state = HEALTH_DEGRADED if errors else HEALTH_OK
+            health.last_error = errors[0] if errors else None
+            health.last_success = time.time()
+            health.retry_at = 0.0
+
+        now = time.time()
+        for address, data in result.items():
+            if not isinstance(data, Exception):
+                self._latest[(port, address)] = data
+                self._timestamps[(port, address)] = now
+        return result
+
+    def _failed(self, port, health, error):
+        self._logger.debug(f"Port {port} failed: {error!r}")
+        health.failures += 1
+        health.last_error = error
+        if health.failures >= self._failures_to_fail:
+            health.state = HEALTH_FAILED
+            delay = min(
+                self._retry_delay
+                * 2 ** (health.failures - self._failures_to_fail),
+                self._retry_delay_max,
+            )
+            health.retry_at = time.monotonic() + delay
+        else:
+            health.state = HEALTH_DEGRADED
+
+    async def async_close(self):
+        """Close all serial ports."""
+        for bus in self._buses.values():
+            await bus.async_close()
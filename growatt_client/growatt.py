@@ -2,19 +2,71 @@
 Python wrapper for getting data asynchronously from Growatt inverters
 via serial RS232/RS485 connection and modbus RTU protocol.
 """
+import asyncio
+import datetime
 import logging
 import os
-
-from pymodbus.client.serial import AsyncModbusSerialClient as ModbusClient
+import time
 
 from .const import (
     ATTRIBUTES,
+    ATTRIBUTES_BY_NAME,
     DEFAULT_ADDRESS,
+    DEFAULT_BAUDRATE,
+    DEFAULT_GAP_COST,
     DEFAULT_PORT,
     DOUBLE_BYTE,
+    HOLDING_ATTRIBUTES,
+    HOLDING_ATTRIBUTES_BY_NAME,
     INT_BYTE,
+    MAX_BLOCK_SIZE,
     SINGLE_BYTE,
+    SYSTEM_DAY,
+    SYSTEM_HOUR,
+    SYSTEM_MINUTE,
+    SYSTEM_MONTH,
+    SYSTEM_SECOND,
+    SYSTEM_YEAR,
+    WRITE_BURST,
+    WRITE_RATE,
+    default_interval,
 )
+from .holding import decode_holding, encode_holding, merge_writes
+from .limiter import RateLimiter
+from .maps import select_register_map
+from .metrics import error_kind
+from .planner import plan_registers
+from .snapshot import SnapshotSchema
+from .template import apply_profile, compile_templates, resolve_attributes
+
+__all__ = [
+    # Exported by the package from the start
+    "ATTRIBUTES",
+    "DEFAULT_ADDRESS",
+    "DEFAULT_PORT",
+    "DOUBLE_BYTE",
+    "INT_BYTE",
+    "SINGLE_BYTE",
+    "get_from_single_byte",
+    "get_from_double_byte",
+    "get_byte",
+    "get_value",
+    "get_string",
+    "group_values",
+    "create_modbus_client",
+    "GrowattClient",
+    "PortException",
+    "ModbusException",
+    "CircuitOpenException",
+    "VerifyException",
+]
+
+_LOGGER = logging.getLogger(__name__)
+_LOGGER.addHandler(logging.NullHandler())
+
+_LAYOUT_CACHE = {}
+# Layouts kept, the oldest is dropped first
+_LAYOUT_CACHE_SIZE = 64
 
 
 def get_from_single_byte(rr, index, scale=0.1):
@@ -54,23 +106,88 @@ def get_string(res, index, length):
 
 
 def group_values(values):
-    values.sort(key=lambda x: x["pos"])
-    groups = []
-    pos = -200
-
-    for value in values:
-        if pos + 100 < value["pos"] or (pos < 0 and value["pos"] >= 0):
-            pos = value["pos"]
-            group_list = []
-            group = {}
-            group["pos"] = pos
-            group["values"] = group_list
-            groups.append(group)
-        group_list.append(value)
-        group["length"] = (
-            value["pos"] - pos + (2 if value["type"] == DOUBLE_BYTE else 1)
-        )
-    return groups
+    """Group values into read requests, see plan_registers."""
+    return plan_registers(values)
+
+
+def create_modbus_client(port, timeout=1, baudrate=DEFAULT_BAUDRATE):
+    """Create the Modbus serial rtu communication client."""
+    # pymodbus is slow to import, so only once a port is opened
+    from pymodbus.client.serial import AsyncModbusSerialClient as ModbusClient
+
+    logging.getLogger("pymodbus.client.serial").setLevel(30)
+    return ModbusClient(
+        port=port,
+        baudrate=baudrate,
+        stopbits=1,
+        parity="N",
+        bytesize=8,
+        timeout=timeout,
+    )
+
+
+def _pymodbus_error():
+    """The pymodbus exception class, imported when first needed."""
+    from pymodbus.exceptions import ModbusException as PymodbusException
+
+    return PymodbusException
+
+
+def _layout(
+    attribute_defs,
+    attributes,
+    include_intermediates,
+    tiered,
+    intervals,
+    max_block,
+    gap_cost,
+):
+    """Plan the requests, templates and schema of an attribute selection."""
+    output = None
+    if attributes is not None:
+        attribute_defs = resolve_attributes(attributes, attribute_defs)
+        if not include_intermediates:
+            selected = set(attributes)
+            output = [
+                attr["name"]
+                for attr in attribute_defs
+                if attr["name"] in selected
+            ]
+
+    values = [attr for attr in attribute_defs if "pos" in attr]
+
+    # Seconds between reads of every request, planned per interval
+    tiers = {}
+    if tiered:
+        for attr in values:
+            interval = intervals.get(attr["name"], default_interval(attr))
+            tiers.setdefault(interval, []).append(attr)
+    else:
+        tiers[0] = values
+    plan = []
+    plan_intervals = []
+    for interval, tier in sorted(tiers.items()):
+        tier_plan = plan_registers(tier, max_block, gap_cost)
+        plan.extend(tier_plan)
+        plan_intervals.extend([interval] * len(tier_plan))
+
+    templates = compile_templates(
+        [attr for attr in attribute_defs if "template" in attr],
+        {attr["name"] for attr in values},
+    )
+
+    if output is None:
+        names = [name for group in plan for name in group["decoder"].names]
+        names += [templ.name for templ in templates]
+    else:
+        names = output
+    return {
+        "output": output,
+        "plan": plan,
+        "intervals": plan_intervals,
+        "templates": templates,
+        "schema": SnapshotSchema(names),
+    }
 
 
 class GrowattClient:
@@ -83,62 +200,324 @@ class GrowattClient:
         attributes=None,
         attribute_defs=ATTRIBUTES,
         logger=None,
+        persistent=False,
+        reconnect_delay=1,
+        reconnect_delay_max=60,
+        max_block=MAX_BLOCK_SIZE,
+        gap_cost=DEFAULT_GAP_COST,
+        client=None,
+        include_intermediates=False,
+        metrics=None,
+        tiered=False,
+        intervals=None,
+        policy=None,
+        profile=None,
+        identity_cache=None,
+        holding_defs=HOLDING_ATTRIBUTES,
+        write_limiter=None,
+        port_lock=None,
+        register_maps=None,
     ):
 
-        logging.getLogger("pymodbus.client.serial").setLevel(30)
-
         """Initialize."""
-        if logger is None:
-            self._logger = logging.getLogger(__name__)
-            self._logger.addHandler(logging.NullHandler())
-        else:
-            self._logger = logger
-
-        if attributes is not None:
-            attribute_defs = []
-            for attr_name in attributes:
-                for a in ATTRIBUTES:
-                    if a["name"] == attr_name:
-                        attribute_defs.append(a)
-
-        _attributes = []
-        for attr in attribute_defs:
-            if True if "pos" in attr else False:
-                _attributes.append(attr)
-
-        self.attributes = group_values(_attributes)
-
-        self.templates = []
-        for attr in attribute_defs:
-            if True if "template" in attr else False:
-                self.templates.append(attr)
+        self._logger = _LOGGER if logger is None else logger
+
+        # Leave out what the inverter is known not to support
+        self._profile = profile
+        baudrate = DEFAULT_BAUDRATE
+        if profile is not None:
+            baudrate = profile.get("baudrate", baudrate)
+
+        tiered = tiered or intervals is not None
+        self._layout_args = (
+            attributes,
+            include_intermediates,
+            tiered,
+            intervals or {},
+            max_block,
+            gap_cost,
+        )
+        self._layout_key = (
+            None if attributes is None else tuple(attributes),
+            include_intermediates,
+            tiered,
+            tuple(sorted((intervals or {}).items())),
+            max_block,
+            gap_cost,
+        )
+        self._set_layout(attribute_defs)
 
         # usb port
         self._port = port
         self._address = address
 
-        if not os.path.exists(self._port):
-            self._logger.debug(f"USB port {self._port} is not available")
-            raise PortException(f"USB port {self._port} is not available")
-
-        # Modbus serial rtu communication client
-        self._client = ModbusClient(
-            port=port,
-            baudrate=9600,
-            stopbits=1,
-            parity="N",
-            bytesize=8,
-            timeout=1,
-        )
+        if client is None:
+            if not os.path.exists(self._port):
+                self._logger.debug(f"USB port {self._port} is not available")
+                raise PortException(f"USB port {self._port} is not available")
+            timeout = 1 if policy is None else policy.max_timeout
+            client = create_modbus_client(port, timeout, baudrate)
+        self._client = client
+
+        # Keep the serial port open between polls when persistent
+        self._persistent = persistent
+        self._connected = False
+        self._reconnect_delay = reconnect_delay
+        self._reconnect_delay_max = reconnect_delay_max
+        self._backoff = 0
+        self._poll_timing = {}
+        # MetricsHook, or None to skip collecting metrics
+        self._metrics = metrics
+        # ReadPolicy, or None to fail a poll on the first failed read
+        self._policy = policy
+        self._invalid = set()
 
         self._serial_number = ""
         self._model_number = ""
         self._firmware = ""
 
+        # Holding attributes by name, and the rate limit of writes
+        self._set_holding(holding_defs)
+        # Created on the first write when None
+        self._write_limiter = write_limiter
+        self._max_block = max_block
+        self._gap_cost = gap_cost
+
+        # PortLock held while the port is open, shared with other processes
+        self._port_lock = port_lock
+
+        # IdentityCache, or None to read the hardware info every run
+        self._identity_cache = identity_cache
+        # Whether the cached hardware info has yet to be checked
+        self._verify_identity = False
+        if identity_cache is not None:
+            info = identity_cache.get(port, address)
+            if info is not None:
+                self._firmware = info["firmware"]
+                self._serial_number = info["serial_number"]
+                self._model_number = info["model_number"]
+                self._verify_identity = True
+
+        # RegisterMaps to pick from by the hardware info, None to keep
+        # the attribute and holding definitions given
+        self._register_maps = register_maps
+        self._register_map = None
+        if register_maps is not None:
+            self._select_register_map()
+
         self._logger.debug(
             f"GrowattClient initialized with usb port {self._port}"
         )
 
+    def _set_layout(self, attribute_defs):
+        """Use the plan, templates and schema of attribute definitions."""
+        self._attribute_defs = attribute_defs
+        if attribute_defs is ATTRIBUTES:
+            self._attributes_by_name = ATTRIBUTES_BY_NAME
+        else:
+            self._attributes_by_name = {
+                attr["name"]: attr for attr in attribute_defs
+            }
+        if self._profile is not None:
+            attribute_defs = apply_profile(attribute_defs, self._profile)
+
+        # Plans, templates and schema are shared by clients selecting
+        # the same attributes from definitions of the same content
+        key = (
+            tuple(
+                (
+                    attr["name"],
+                    attr.get("pos"),
+                    attr.get("type"),
+                    attr.get("scale"),
+                    attr.get("template"),
+                )
+                for attr in attribute_defs
+            ),
+        ) + self._layout_key
+        layout = _LAYOUT_CACHE.get(key)
+        if layout is None:
+            layout = _layout(attribute_defs, *self._layout_args)
+            if len(_LAYOUT_CACHE) >= _LAYOUT_CACHE_SIZE:
+                del _LAYOUT_CACHE[next(iter(_LAYOUT_CACHE))]
+            _LAYOUT_CACHE[key] = layout
+        # Attributes returned by async_update, None for all
+        self._output = layout["output"]
+        self.attributes = layout["plan"]
+        self._intervals = layout["intervals"]
+        self._tiered = any(self._intervals)
+        # Values and time of the last read of every request
+        self._block_values = [None] * len(self.attributes)
+        self._block_times = [None] * len(self.attributes)
+        self.templates = layout["templates"]
+        self._schema = layout["schema"]
+
+    def _set_holding(self, holding_defs):
+        if holding_defs is HOLDING_ATTRIBUTES:
+            self._holding_defs = HOLDING_ATTRIBUTES_BY_NAME
+        else:
+            self._holding_defs = {attr["name"]: attr for attr in holding_defs}
+
+    def _select_register_map(self):
+        """Switch to the register map matching the hardware info."""
+        register_map = select_register_map(
+            self._register_maps, self._model_number, self._firmware
+        )
+        if register_map is self._register_map:
+            return
+        self._logger.debug(
+            f"Inverter {self._address} on {self._port} uses the "
+            f"{register_map.family} register map."
+        )
+        self._register_map = register_map
+        self._set_layout(register_map.attributes)
+        self._set_holding(register_map.holding)
+
+    async def __aenter__(self):
+        """Open a persistent session."""
+        self._persistent = True
+        await self.async_connect()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        """Close the persistent session."""
+        await self.async_close()
+
+    async def async_connect(self):
+        """Open the Modbus connection, if not already open."""
+        if self._connected:
+            return
+        start = time.perf_counter()
+        if self._port_lock is not None:
+            await self._port_lock.acquire()
+        if not await self._client.connect():
+            if self._port_lock is not None:
+                self._port_lock.release()
+            self._logger.debug("Modbus connection failed.")
+            raise ModbusException("Modbus connection failed.")
+        self._connected = True
+        # A transport shared by a bus reports when it opens the port
+        if self._metrics is not None and not getattr(
+            self._client, "reports_connect", False
+        ):
+            self._metrics.on_connect(
+                self._address, time.perf_counter() - start
+            )
+
+    async def async_close(self):
+        """Close the Modbus connection."""
+        if self._connected:
+            self._connected = False
+            await self._client.close()
+            if self._port_lock is not None:
+                self._port_lock.release()
+
+    async def _async_release(self):
+        """Close the connection unless the session is persistent."""
+        if not self._persistent:
+            await self.async_close()
+
+    async def _async_reconnect(self):
+        """Reopen the connection, backing off on repeated failures."""
+        await self.async_close()
+        self._backoff = min(
+            max(self._backoff * 2, self._reconnect_delay),
+            self._reconnect_delay_max,
+        )
+        self._logger.debug(f"Reconnecting in {self._backoff} s.")
+        await asyncio.sleep(self._backoff)
+        await self.async_connect()
+
+    async def _async_reopen(self):
+        """
+        Reopen the transport after a request was abandoned.
+
+        pymodbus matches RTU replies to requests by slave address only,
+        a late reply would otherwise answer the next request.
+        """
+        await self._client.close()
+        if not await self._client.connect():
+            # The next poll connects again
+            await self.async_close()
+
+    async def _async_read(self, pos, length, holding=False):
+        """
+        Read a block of input or holding registers.
+
+        Failed reads are retried as the policy says, and in persistent
+        mode a read still failing triggers one reconnect and retry.
+        """
+        if holding:
+            read = self._client.read_holding_registers
+        else:
+            read = self._client.read_input_registers
+
+        policy = self._policy
+        metrics = self._metrics
+        attempts = 1 if policy is None else policy.retries + 1
+        for attempt in range(attempts):
+            if attempt:
+                if metrics is not None:
+                    metrics.on_retry(self._address, pos)
+                await asyncio.sleep(policy.retry_wait(attempt))
+            registers = await self._async_read_once(read, pos, length)
+            if registers is not None and not registers.isError():
+                break
+
+        if self._persistent and (registers is None or registers.isError()):
+            if metrics is not None:
+                metrics.on_retry(self._address, pos)
+            await self._async_reconnect()
+            registers = await self._async_read_once(read, pos, length)
+
+        if registers is None:
+            registers = _FailedRead()
+        if not registers.isError():
+            self._backoff = 0
+        return registers
+
+    async def _async_read_once(self, read, pos, length):
+        """Read once, returns None when the read raised."""
+        policy = self._policy
+        metrics = self._metrics
+        start = time.perf_counter()
+        try:
+            if policy is None:
+                registers = await read(pos, length, slave=self._address)
+            else:
+                registers = await asyncio.wait_for(
+                    read(pos, length, slave=self._address),
+                    policy.timeout(pos),
+                )
+        except asyncio.TimeoutError:
+            if metrics is not None:
+                metrics.on_error(self._address, pos, "timeout")
+            await self._async_reopen()
+            return None
+        except _pymodbus_error() as error:
+            if metrics is not None:
+                metrics.on_error(self._address, pos, error_kind(error))
+            if not self._persistent and policy is None:
+                # The next poll connects again, and the port is free
+                await self.async_close()
+                raise
+            return None
+
+        seconds = time.perf_counter() - start
+        if not registers.isError() and len(registers.registers) != length:
+            # The reply to another request, later ones may be off too
+            if metrics is not None:
+                metrics.on_error(self._address, pos, "error")
+            await self._async_reopen()
+            return None
+        if metrics is not None:
+            metrics.on_read(self._address, pos, seconds)
+            if registers.isError():
+                metrics.on_error(self._address, pos, error_kind(registers))
+        if policy is not None and not registers.isError():
+            policy.observe(pos, seconds)
+        return registers
+
     async def async_update(self):
         """
         Read Growatt data.
@@ -150,118 +529,391 @@ class GrowattClient:
         """
 
         data = {}
-        await self.update_hardware_info()
-
-        if not await self._client.connect():
-            self._logger.debug("Modbus connection failed.")
-            raise ModbusException("Modbus connection failed.")
+        timing = {}
+        start = time.perf_counter()
+
+        policy = self._policy
+        partial = policy is not None and policy.partial
+        if policy is not None and not policy.allow():
+            raise CircuitOpenException(
+                f"Circuit open for inverter {self._address}."
+            )
 
-        for group in self.attributes:
+        try:
+            await self.async_connect()
+            timing["connect"] = time.perf_counter() - start
+
+            mark = time.perf_counter()
+            if self._serial_number == "":
+                await self._async_read_hardware_info()
+            timing["hardware_info"] = time.perf_counter() - mark
+        except ModbusException:
+            if policy is not None:
+                policy.record_poll(False)
+            raise
+
+        # A changed identity may switch the register map after the reads,
+        # finish this poll with the templates and output it read for
+        templates = self.templates
+        output = self._output
+
+        mark = time.perf_counter()
+        decode_time = 0.0
+        now = time.monotonic()
+        invalid = set()
+        read_any = False
+        for index, group in enumerate(self.attributes):
             pos = group["pos"]
-            values = group["values"]
-            self._logger.debug(group)
+            decoder = group["decoder"]
+            if self._tiered and self._block_times[index] is not None:
+                if now - self._block_times[index] < self._intervals[index]:
+                    data.update(zip(decoder.names, self._block_values[index]))
+                    continue
 
-            registers = await self._client.read_input_registers(
-                pos, group["length"], slave=self._address
-            )
+            registers = await self._async_read(pos, group["length"])
 
             if registers.isError():
-                await self._client.close()
+                if partial:
+                    invalid.update(decoder.names)
+                    continue
+                await self.async_close()
+                if policy is not None:
+                    policy.record_poll(False)
                 self._logger.debug(f"Modbus read failed for registers {pos}.")
                 raise ModbusException(
                     f"Modbus read failed for registers {pos}."
                 )
-            for value in values:
-                val = get_value(
-                    registers,
-                    value["pos"] - pos,
-                    value["type"],
-                    value["scale"],
-                )
-                data[value["name"]] = val
+            read_any = True
+            decode_start = time.perf_counter()
+            values = decoder.decode(registers.registers)
+            data.update(zip(decoder.names, values))
+            decode_time += time.perf_counter() - decode_start
+            self._block_values[index] = values
+            self._block_times[index] = now
+        timing["read"] = time.perf_counter() - mark - decode_time
+        timing["decode"] = decode_time
+
+        if invalid and not read_any:
+            await self.async_close()
+            policy.record_poll(False)
+            self._logger.debug("Modbus read failed for all registers.")
+            raise ModbusException("Modbus read failed for all registers.")
+        if policy is not None and read_any:
+            policy.record_poll(True)
+
+        if self._verify_identity and read_any:
+            mark = time.perf_counter()
+            await self._async_verify_identity()
+            timing["hardware_info"] += time.perf_counter() - mark
+
+        mark = time.perf_counter()
+        await self._async_release()
+        timing["close"] = time.perf_counter() - mark
+
+        mark = time.perf_counter()
+        if invalid:
+            for templ in templates:
+                if invalid.isdisjoint(templ.inputs):
+                    data[templ.name] = templ.evaluate(data)
+                else:
+                    invalid.add(templ.name)
+        else:
+            for templ in templates:
+                data[templ.name] = templ.evaluate(data)
+        timing["templates"] = time.perf_counter() - mark
+
+        if output is not None:
+            if invalid:
+                data = {n: data[n] for n in output if n in data}
+            else:
+                data = {name: data[name] for name in output}
+        self._invalid = invalid
+
+        timing["total"] = time.perf_counter() - start
+        self._poll_timing = timing
+
+        metrics = self._metrics
+        if metrics is not None:
+            metrics.on_decode(self._address, timing["decode"])
+            metrics.on_templates(self._address, timing["templates"])
+            metrics.on_poll(self._address, timing["total"])
 
-        await self._client.close()
+        return data
 
-        for value in self.templates:
-            templ = value["template"].format_map(data)
-            self._logger.debug(templ)
-            val = round(eval(templ), 1)
-            self._logger.debug(
-                "Converting template: %s \n -> to: %s = %f",
-                value["template"],
-                templ,
-                val,
-            )
-            data[value["name"]] = val
+    async def async_update_snapshot(self):
+        """Read Growatt data into a Snapshot, stamped with time.time()."""
+        data = await self.async_update()
+        return self._schema.make(data, time.time())
 
-        return data
+    async def stream(
+        self, interval=5, deadbands=None, deadband=0, skip_errors=True
+    ):
+        """
+        Poll every interval seconds and yield what changed.
+
+        Yields (timestamp, changes) where timestamp is the time.monotonic()
+        of the poll and changes holds the attributes that moved more than
+        their deadband since they were last yielded, polls without changes
+        are not yielded. deadbands sets the deadband per attribute,
+        deadband for the others.
+
+        Polls are kept on a fixed schedule from the first one. A poll only
+        starts once the previous changes are consumed, ticks missed while
+        waiting for a slow consumer are skipped. With skip_errors a failed
+        poll is logged and its tick skipped, keeping the values yielded so
+        far, otherwise the error ends the stream.
+        """
+        deadbands = deadbands or {}
+        sent = {}
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        tick = 0
+        while True:
+            try:
+                data = await self.async_update()
+            except (ModbusException, _pymodbus_error()) as error:
+                if not skip_errors:
+                    raise
+                self._logger.debug(f"Stream poll failed: {error}")
+                data = {}
+            timestamp = time.monotonic()
+            changes = {}
+            for name, value in data.items():
+                last = sent.get(name)
+                if last is None or abs(value - last) > deadbands.get(
+                    name, deadband
+                ):
+                    changes[name] = value
+            sent.update(changes)
+            if changes:
+                yield timestamp, changes
+
+            tick = max(tick + 1, int((loop.time() - start) / interval) + 1)
+            await asyncio.sleep(max(0, start + tick * interval - loop.time()))
 
     async def update_hardware_info(self):
         if self._serial_number == "":
-            if not await self._client.connect():
-                self._logger.debug("Modbus connection failed.")
-                raise ModbusException("Modbus connection failed.")
+            await self.async_connect()
+            await self._async_read_hardware_info()
+            await self._async_release()
+
+    async def _async_read_hardware_info(self):
+        # Assuming the serial number doesn't change, it is read only once
+        registers = await self._async_read(0, 30, holding=True)
+        if registers.isError():
+            await self.async_close()
+            self._logger.debug("Modbus read failed for holding registers.")
+            raise ModbusException("Modbus read failed for holding registers.")
+
+        self._firmware = get_string(registers, 9, 3)
+        self._serial_number = get_string(registers, 23, 5)
+
+        mo = (registers.registers[28] << 16) + registers.registers[29]
+        self._model_number = (
+            "T"
+            + str((mo & 0xF00000) >> 20)
+            + " Q"
+            + str((mo & 0x0F0000) >> 16)
+            + " P"
+            + str((mo & 0x00F000) >> 12)
+            + " U"
+            + str((mo & 0x000F00) >> 8)
+            + " M"
+            + str((mo & 0x0000F0) >> 4)
+            + " S"
+            + str((mo & 0x00000F))
+        )
 
-            # Assuming the serial number doesn't change, it is read only once
-            registers = await self._client.read_holding_registers(
-                0, 30, slave=self._address
+        self._logger.debug(
+            (
+                f"Growatt serial number {self._serial_number} "
+                f"is model {self._model_number} "
+                f"and has firmware {self._firmware}."
+            )
+        )
+
+        self._verify_identity = False
+        if self._register_maps is not None:
+            self._select_register_map()
+        if self._identity_cache is not None:
+            self._identity_cache.put(
+                self._port,
+                self._address,
+                self._firmware,
+                self._serial_number,
+                self._model_number,
+            )
+
+    async def _async_verify_identity(self):
+        """Check the cached hardware info by reading the serial number."""
+        try:
+            registers = await self._async_read(23, 5, holding=True)
+        except (ModbusException, _pymodbus_error()):
+            return
+        if registers.isError():
+            # Try again with the next poll
+            return
+        serial_number = get_string(registers, 0, 5)
+        if serial_number == self._serial_number:
+            self._verify_identity = False
+            return
+        self._logger.debug(
+            f"Inverter {self._address} on {self._port} changed from "
+            f"{self._serial_number} to {serial_number}."
+        )
+        await self._async_read_hardware_info()
+
+    async def async_read_holding(self, names=None):
+        """
+        Read holding attributes by name, all of them when names is None.
+
+        Unknown names are ignored.
+        """
+        if names is None:
+            values = list(self._holding_defs.values())
+        else:
+            values = [
+                self._holding_defs[name]
+                for name in names
+                if name in self._holding_defs
+            ]
+
+        data = {}
+        await self.async_connect()
+        for group in plan_registers(values, self._max_block, self._gap_cost):
+            pos = group["pos"]
+            registers = await self._async_read(
+                pos, group["length"], holding=True
             )
             if registers.isError():
-                await self._client.close()
-                self._logger.debug("Modbus read failed for holding registers.")
+                await self.async_close()
+                self._logger.debug(
+                    f"Modbus read failed for holding registers {pos}."
+                )
                 raise ModbusException(
-                    "Modbus read failed for holding registers."
+                    f"Modbus read failed for holding registers {pos}."
+                )
+            for attr in group["values"]:
+                data[attr["name"]] = decode_holding(
+                    attr, registers.registers, pos
                 )
+        await self._async_release()
+        return data
 
-            self._firmware = get_string(registers, 9, 3)
-            self._serial_number = get_string(registers, 23, 5)
-
-            mo = (registers.registers[28] << 16) + registers.registers[29]
-            self._model_number = (
-                "T"
-                + str((mo & 0xF00000) >> 20)
-                + " Q"
-                + str((mo & 0x0F0000) >> 16)
-                + " P"
-                + str((mo & 0x00F000) >> 12)
-                + " U"
-                + str((mo & 0x000F00) >> 8)
-                + " M"
-                + str((mo & 0x0000F0) >> 4)
-                + " S"
-                + str((mo & 0x00000F))
-            )
+    async def async_write_holding(self, values, verify=True):
+        """
+        Write holding attributes, from a dict of values by name.
 
-            self._logger.debug(
-                (
-                    f"Growatt serial number {self._serial_number} "
-                    f"is model {self._model_number} "
-                    f"and has firmware {self._firmware}."
+        All values are checked against their definitions before anything
+        is written. Adjacent registers are written in one request, and
+        with verify every request is read back and compared.
+        """
+        words = {}
+        for name, value in values.items():
+            attr = self._holding_defs.get(name)
+            if attr is None:
+                raise ValueError(f"Unknown holding attribute {name}.")
+            words[attr["pos"]] = encode_holding(attr, value)
+
+        await self.async_connect()
+        try:
+            for pos, block in merge_writes(words):
+                await self._async_write(pos, block)
+                if not verify:
+                    continue
+                registers = await self._async_read(
+                    pos, len(block), holding=True
                 )
+                if registers.isError() or list(registers.registers) != block:
+                    raise VerifyException(
+                        f"Holding registers {pos} read back other values."
+                    )
+        except ModbusException as error:
+            self._logger.debug(f"Write failed: {error}")
+            await self.async_close()
+            raise
+        await self._async_release()
+
+    async def _async_write(self, pos, block):
+        """Write registers from pos, rate limited."""
+        if self._write_limiter is None:
+            self._write_limiter = RateLimiter(WRITE_RATE, WRITE_BURST)
+        await self._write_limiter.acquire()
+        if len(block) == 1:
+            request = self._client.write_register(
+                pos, block[0], slave=self._address
+            )
+        else:
+            request = self._client.write_registers(
+                pos, block, slave=self._address
+            )
+        timeout = None if self._policy is None else self._policy.max_timeout
+        try:
+            response = await asyncio.wait_for(request, timeout)
+        except asyncio.TimeoutError as error:
+            await self._async_reopen()
+            raise ModbusException(
+                f"Modbus write failed for holding registers {pos}: {error!r}"
+            )
+        except _pymodbus_error() as error:
+            raise ModbusException(
+                f"Modbus write failed for holding registers {pos}: {error!r}"
+            )
+        if response.isError():
+            raise ModbusException(
+                f"Modbus write failed for holding registers {pos}."
             )
 
-            # Read time
-            # self._logger.info(
-            #     (
-            #         f"{registers.registers[45]}-"
-            #         f"{registers.registers[46]:02d}-"
-            #         f"{registers.registers[47]:02d} "
-            #         f"{registers.registers[48]:02d}:"
-            #         f"{registers.registers[49]:02d}:"
-            #         f"{registers.registers[50]:02d} "
-            #         # f"day: {registers.registers[51]} "
-            #     )
-            # )
+    async def async_get_time(self):
+        """Read the clock of the inverter, as a naive local datetime."""
+        data = await self.async_read_holding(_CLOCK)
+        return datetime.datetime(*(data[name] for name in _CLOCK))
 
-            await self._client.close()
+    async def async_set_time(self, when=None, tolerance=5):
+        """
+        Set the clock of the inverter, to the local time by default.
+
+        The clock keeps running, so it is read back and checked to be
+        within tolerance seconds of the time set, plus the time taken.
+        """
+        if when is None:
+            when = datetime.datetime.now()
+        parts = (
+            when.year,
+            when.month,
+            when.day,
+            when.hour,
+            when.minute,
+            when.second,
+        )
+        start = time.monotonic()
+        await self.async_write_holding(dict(zip(_CLOCK, parts)), verify=False)
+        try:
+            clock = await self.async_get_time()
+        except ValueError:
+            clock = None
+        elapsed = time.monotonic() - start
+        if clock is None or not (
+            -tolerance
+            <= (clock - when.replace(microsecond=0)).total_seconds()
+            <= elapsed + tolerance
+        ):
+            raise VerifyException(
+                f"Inverter clock reads {clock} after setting {when}."
+            )
+
+    def get_holding_attributes(self):
+        return list(self._holding_defs.values())
 
     def get_attributes(self):
-        return ATTRIBUTES
+        return self._attribute_defs
 
     def get_attribute(self, name):
-        for a in self.get_attributes():
-            if a["name"] == name:
-                return a
+        return self._attributes_by_name.get(name)
+
+    def get_register_map(self):
+        """Return the RegisterMap in use, None without register maps."""
+        return self._register_map
 
     def get_serial_number(self):
         return self._serial_number
@@ -272,6 +924,50 @@ class GrowattClient:
     def get_model_number(self):
         return self._model_number
 
+    def get_validity(self):
+        """Return whether every attribute was read in the last poll."""
+        return {name: name not in self._invalid for name in self._schema.names}
+
+    def get_schema(self):
+        """Return the SnapshotSchema of the data returned."""
+        return self._schema
+
+    def get_read_times(self):
+        """Return the monotonic time every attribute was last read at."""
+        return {
+            name: read_time
+            for group, read_time in zip(self.attributes, self._block_times)
+            for name in group["decoder"].names
+        }
+
+    def get_register_plan(self):
+        """Return the read requests made on every poll."""
+        return self.attributes
+
+    def get_poll_timing(self):
+        """Return the latency breakdown, in seconds, of the last poll."""
+        return self._poll_timing
+
+
+# Holding attributes of the inverter clock, in datetime argument order
+_CLOCK = (
+    SYSTEM_YEAR,
+    SYSTEM_MONTH,
+    SYSTEM_DAY,
+    SYSTEM_HOUR,
+    SYSTEM_MINUTE,
+    SYSTEM_SECOND,
+)
+
+
+class _FailedRead:
+    """Response of a read that raised or timed out."""
+
+    registers = None
+
+    def isError(self):
+        return True
+
 
 class PortException(Exception):
     """Raised when the USB port in not available."""
@@ -289,3 +985,11 @@ class ModbusException(Exception):
         """Initialize."""
         super(ModbusException, self).__init__(status)
         self.status = status
+
+
+class CircuitOpenException(ModbusException):
+    """Raised when polls are held back after the inverter stopped answering."""
+
+
+class VerifyException(ModbusException):
+    """Raised when written holding registers read back other values."""
@@ -0,0 +1,67 @@
+"""Decode, encode and batch holding register attributes."""
+import math
+import numbers
+
+from .const import MAX_WRITE_BLOCK, SIGNED_BYTE, TIME_OF_DAY
+
+__all__ = ["decode_holding", "encode_holding", "merge_writes"]
+
+
+def decode_holding(attr, registers, offset=0):
+    """Value of a holding attribute from registers starting at offset."""
+    word = registers[attr["pos"] - offset]
+    if attr["type"] == TIME_OF_DAY:
+        return f"{word >> 8:02d}:{word & 0xFF:02d}"
+    if attr["type"] == SIGNED_BYTE and word & 0x8000:
+        word -= 0x10000
+    if attr["scale"] == 1:
+        return word
+    return round(word * attr["scale"], 3)
+
+
+def encode_holding(attr, value):
+    """Register word of a holding attribute value, checking its range."""
+    name = attr["name"]
+    if not attr.get("writable"):
+        raise ValueError(f"{name} is not writable.")
+
+    if attr["type"] == TIME_OF_DAY:
+        try:
+            hour, minute = (int(part) for part in str(value).split(":"))
+        except ValueError:
+            raise ValueError(f"{name} takes a time as HH:MM, not {value!r}.")
+        if not (0 <= hour <= 23 and 0 <= minute <= 59):
+            raise ValueError(f"{name} takes a time as HH:MM, not {value!r}.")
+        return (hour << 8) + minute
+
+    if not isinstance(value, numbers.Real) or not math.isfinite(value):
+        raise ValueError(f"{name} takes a number, not {value!r}.")
+    if attr["min"] is not None and value < attr["min"]:
+        raise ValueError(f"{name} must be at least {attr['min']}.")
+    if attr["max"] is not None and value > attr["max"]:
+        raise ValueError(f"{name} must be at most {attr['max']}.")
+    word = int(round(value / attr["scale"]))
+    if attr["type"] == SIGNED_BYTE:
+        return word & 0xFFFF
+    return word
+
+
+def merge_writes(words, max_block=MAX_WRITE_BLOCK):
+    """
+    Merge register words by position into write requests.
+
+    Only adjacent registers are merged, a gap would overwrite the
+    registers in between. Returns (pos, words) per request, in order.
+    """
+    requests = []
+    for pos in sorted(words):
+        last = requests[-1] if requests else None
+        if (
+            last is not None
+            and last[0] + len(last[1]) == pos
+            and len(last[1]) < max_block
+        ):
+            last[1].append(words[pos])
+        else:
+            requests.append((pos, [words[pos]]))
+    return requests
@@ -0,0 +1,69 @@
+"""
+Remember the hardware info of inverters between runs.
+
+The cache is a JSON file mapping "port:address" to the firmware, serial
+number and model number last read there, so a new client does not have
+to read the holding registers again before its first poll.
+"""
+import json
+import os
+import time
+
+from .files import atomic_write
+
+__all__ = ["DEFAULT_IDENTITY_CACHE", "IdentityCache"]
+
+DEFAULT_IDENTITY_CACHE = os.path.join(
+    os.path.expanduser("~"), ".cache", "growatt_client", "identity.json"
+)
+
+
+class IdentityCache:
+    """Hardware info per port and address, kept in a JSON file."""
+
+    def __init__(self, path=DEFAULT_IDENTITY_CACHE):
+        self.path = path
+        self._entries = None
+
+    def _load(self):
+        if self._entries is None:
+            try:
+                with open(self.path) as file:
+                    self._entries = json.load(file)
+            except (OSError, ValueError):
+                self._entries = {}
+        return self._entries
+
+    def get(self, port, address):
+        """Return the cached info of an inverter, or None."""
+        return self._load().get(f"{port}:{address}")
+
+    def put(self, port, address, firmware, serial_number, model_number):
+        """Store the info of an inverter, writing the file at once."""
+        self._update(
+            f"{port}:{address}",
+            {
+                "firmware": firmware,
+                "serial_number": serial_number,
+                "model_number": model_number,
+                "read_at": time.time(),
+            },
+        )
+
+    def remove(self, port, address):
+        self._update(f"{port}:{address}", None)
+
+    def _update(self, key, entry):
+        """Set or remove one entry of the file as it is now."""
+        # Other caches and processes may have written since the load
+        self._entries = None
+        entries = self._load()
+        if entry is not None:
+            entries[key] = entry
+        elif entries.pop(key, None) is None:
+            return
+        self._save(entries)
+
+    def _save(self, entries):
+        with atomic_write(self.path) as file:
+            json.dump(entries, file, indent=2, sort_keys=True)
@@ -0,0 +1,39 @@
+"""Rate limit Modbus requests."""
+import asyncio
+import time
+
+__all__ = ["RateLimiter"]
+
+
+class RateLimiter:
+    """
+    Token bucket limiting requests to rate per second.
+
+    Up to burst requests go through at once after an idle period.
+    One limiter can be shared by several buses to set a global limit.
+    """
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        # Created in the running loop, see GrowattBus
+        self._lock = None
+
+    async def acquire(self):
+        """Wait until a request is allowed."""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.burst,
+                    self._tokens + (now - self._updated) * self.rate,
+                )
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
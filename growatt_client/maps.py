@@ -0,0 +1,430 @@
+"""
+Register maps of inverter families, loaded from data files.
+
+A register map is a JSON, TOML or YAML (with PyYAML installed) file:
+
+    family          name of the inverter family, as "min_tl_x"
+    version         of the map, an integer
+    description     optional
+    match           optional, model and firmware fnmatch patterns, as
+                    {"model": ["T0 Q0 P1*"], "firmware": ["GH*"]}
+    input           input register attributes and templates
+    holding         optional, holding register attributes
+
+Attributes take the keys of create_value, create_template and
+create_holding in const, with the same defaults. A map is validated
+and planned when loaded, so a broken map fails at start and not on
+the first poll.
+
+The family of an inverter is picked by the model number and firmware
+read with its hardware info: the map matching the most of them wins,
+and the built in SPH TL3 map of const when none does.
+"""
+import fnmatch
+import json
+import os
+import re
+
+from .const import (
+    ATTRIBUTES,
+    DOUBLE_BYTE,
+    HOLDING_ATTRIBUTES,
+    INT_BYTE,
+    SIGNED_BYTE,
+    SINGLE_BYTE,
+    TIME_OF_DAY,
+)
+from .files import atomic_write
+from .planner import plan_registers, value_width
+from .template import TemplateException, compile_templates
+
+__all__ = [
+    "MAP_EXTENSIONS",
+    "RegisterMap",
+    "DEFAULT_MAP",
+    "load_register_map",
+    "load_register_maps",
+    "select_register_map",
+    "save_register_map",
+]
+
+MAP_EXTENSIONS = (".json", ".toml", ".yaml", ".yml")
+
+_NAME = re.compile(r"^\w+$")
+_INPUT_TYPES = (INT_BYTE, SINGLE_BYTE, DOUBLE_BYTE)
+_HOLDING_TYPES = (INT_BYTE, SIGNED_BYTE, TIME_OF_DAY)
+_VALUE_KEYS = {"name", "pos", "type", "unit", "description", "scale"}
+_TEMPLATE_KEYS = {"name", "unit", "description", "template"}
+_HOLDING_KEYS = _VALUE_KEYS | {"min", "max", "writable"}
+_MATCH_KEYS = ("model", "firmware")
+
+
+class RegisterMap:
+    """
+    Validated register map of an inverter family.
+
+    attributes and holding are definitions as in const, usable as the
+    attribute_defs and holding_defs of a GrowattClient. Raises
+    ValueError when an entry is malformed, two registers overlap or a
+    template uses an attribute the map does not have.
+    """
+
+    def __init__(
+        self,
+        family,
+        attributes,
+        holding=(),
+        version=1,
+        match=None,
+        description="",
+        source=None,
+    ):
+        self.source = source or family
+        if not isinstance(family, str) or not _NAME.match(family):
+            raise ValueError(f"{self.source}: family must be a word.")
+        if not isinstance(version, int):
+            raise ValueError(f"{self.source}: version must be an integer.")
+        self.family = family
+        self.version = version
+        self.description = description
+        self.match = self._match(match or {})
+
+        self.attributes = [
+            self._input(attr, index) for index, attr in enumerate(attributes)
+        ]
+        self.holding = [
+            self._holding(attr, index) for index, attr in enumerate(holding)
+        ]
+        values = [attr for attr in self.attributes if "pos" in attr]
+        self._check_names(self.attributes, "input")
+        self._check_names(self.holding, "holding")
+        self._check_overlap(values, "input")
+        self._check_overlap(self.holding, "holding")
+
+        # Planned and compiled once, clients reading every attribute
+        # find the plan in the planner cache
+        self.plan = plan_registers(values)
+        try:
+            self.templates = compile_templates(
+                [attr for attr in self.attributes if "template" in attr],
+                {attr["name"] for attr in values},
+            )
+        except TemplateException as error:
+            raise ValueError(f"{self.source}: {error}") from None
+
+    def __repr__(self):
+        return f"RegisterMap({self.family!r}, version={self.version})"
+
+    def _error(self, kind, index, attr, message):
+        name = attr.get("name") if isinstance(attr, dict) else None
+        label = f"{kind} {index}" if name is None else f"{kind} {name}"
+        return ValueError(f"{self.source}: {label} {message}")
+
+    def _match(self, match):
+        if not isinstance(match, dict) or set(match) - set(_MATCH_KEYS):
+            raise ValueError(
+                f"{self.source}: match takes {' and '.join(_MATCH_KEYS)}."
+            )
+        result = {}
+        for key in _MATCH_KEYS:
+            patterns = match.get(key, [])
+            if isinstance(patterns, str):
+                patterns = [patterns]
+            if not all(isinstance(p, str) for p in patterns):
+                raise ValueError(
+                    f"{self.source}: match {key} must be patterns."
+                )
+            if patterns:
+                result[key] = list(patterns)
+        return result
+
+    def _common(self, attr, index, kind, keys, types, default_type):
+        if not isinstance(attr, dict):
+            raise self._error(kind, index, attr, "is not a table.")
+        unknown = set(attr) - keys
+        if unknown:
+            raise self._error(
+                kind, index, attr, f"has unknown keys {sorted(unknown)}."
+            )
+        name = attr.get("name")
+        if not isinstance(name, str) or not _NAME.match(name):
+            raise self._error(kind, index, attr, "needs a name.")
+
+        pos = attr.get("pos")
+        if not isinstance(pos, int) or isinstance(pos, bool) or pos < 0:
+            raise self._error(kind, index, attr, "needs a register pos.")
+        attr_type = attr.get("type", default_type)
+        if attr_type not in types:
+            raise self._error(
+                kind, index, attr, f"has unknown type {attr_type!r}."
+            )
+        if pos + value_width({"type": attr_type}) > 0x10000:
+            raise self._error(kind, index, attr, "is past register 65535.")
+        return name, pos, attr_type
+
+    @staticmethod
+    def _same(result, attr):
+        # Complete definitions, as those of const, are kept as they are
+        return attr if attr == result else result
+
+    @staticmethod
+    def _number(value):
+        return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+    def _input(self, attr, index):
+        if isinstance(attr, dict) and "template" in attr:
+            unknown = set(attr) - _TEMPLATE_KEYS
+            if unknown:
+                raise self._error(
+                    "input",
+                    index,
+                    attr,
+                    f"has unknown keys {sorted(unknown)}.",
+                )
+            name = attr.get("name")
+            if not isinstance(name, str) or not _NAME.match(name):
+                raise self._error("input", index, attr, "needs a name.")
+            if not isinstance(attr["template"], str):
+                raise self._error("input", index, attr, "needs a template.")
+            return self._same(
+                {
+                    "name": name,
+                    "unit": attr.get("unit"),
+                    "description": attr.get("description", name),
+                    "template": " ".join(attr["template"].split()),
+                },
+                attr,
+            )
+
+        name, pos, attr_type = self._common(
+            attr, index, "input", _VALUE_KEYS, _INPUT_TYPES, DOUBLE_BYTE
+        )
+        scale = attr.get("scale", 0.1)
+        if not self._number(scale) or scale <= 0:
+            raise self._error("input", index, attr, "needs a positive scale.")
+        return self._same(
+            {
+                "name": name,
+                "pos": pos,
+                "type": attr_type,
+                "unit": attr.get("unit"),
+                "description": attr.get("description", name),
+                "scale": scale,
+            },
+            attr,
+        )
+
+    def _holding(self, attr, index):
+        name, pos, attr_type = self._common(
+            attr, index, "holding", _HOLDING_KEYS, _HOLDING_TYPES, INT_BYTE
+        )
+        scale = attr.get("scale", 1)
+        if not self._number(scale) or scale <= 0:
+            raise self._error(
+                "holding", index, attr, "needs a positive scale."
+            )
+        minimum = attr.get("min")
+        maximum = attr.get("max")
+        for bound in (minimum, maximum):
+            if bound is not None and not self._number(bound):
+                raise self._error(
+                    "holding", index, attr, "needs numbers as min and max."
+                )
+        if minimum is not None and maximum is not None and minimum > maximum:
+            raise self._error("holding", index, attr, "has min above max.")
+        writable = attr.get("writable", True)
+        if not isinstance(writable, bool):
+            raise self._error("holding", index, attr, "needs a bool writable.")
+        return self._same(
+            {
+                "name": name,
+                "pos": pos,
+                "type": attr_type,
+                "unit": attr.get("unit"),
+                "description": attr.get("description", name),
+                "scale": scale,
+                "min": minimum,
+                "max": maximum,
+                "writable": writable,
+            },
+            attr,
+        )
+
+    def _check_names(self, attributes, kind):
+        seen = set()
+        for attr in attributes:
+            if attr["name"] in seen:
+                raise ValueError(
+                    f"{self.source}: {kind} {attr['name']} is defined twice."
+                )
+            seen.add(attr["name"])
+
+    def _check_overlap(self, values, kind):
+        last = None
+        for value in sorted(values, key=lambda x: x["pos"]):
+            end = value["pos"] + value_width(value)
+            if last is not None and value["pos"] < last[1]:
+                raise ValueError(
+                    f"{self.source}: {kind} {value['name']} at "
+                    f"{value['pos']} overlaps {last[0]['name']}."
+                )
+            if last is None or end > last[1]:
+                last = (value, end)
+
+    def matches(self, model_number, firmware):
+        """Number of match keys the hardware info matches, None if not."""
+        found = {"model": model_number or "", "firmware": firmware or ""}
+        for key, patterns in self.match.items():
+            if not any(
+                fnmatch.fnmatchcase(found[key], pattern)
+                for pattern in patterns
+            ):
+                return None
+        return len(self.match)
+
+    def as_dict(self):
+        """The map as written to a file."""
+        result = {
+            "family": self.family,
+            "version": self.version,
+            "input": self.attributes,
+        }
+        if self.description:
+            result["description"] = self.description
+        if self.match:
+            result["match"] = self.match
+        if self.holding:
+            result["holding"] = self.holding
+        return result
+
+
+DEFAULT_MAP = RegisterMap(
+    "sph_tl3",
+    ATTRIBUTES,
+    HOLDING_ATTRIBUTES,
+    description="Growatt SPH TL3, the built in definitions of const.",
+)
+
+
+def _read(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".json":
+        with open(path) as file:
+            return json.load(file)
+    if extension == ".toml":
+        try:
+            import tomllib
+        except ImportError:
+            try:
+                import tomli as tomllib
+            except ImportError:
+                raise ImportError(
+                    f"Reading {path} needs Python 3.11 or tomli."
+                )
+        with open(path, "rb") as file:
+            return tomllib.load(file)
+    if extension in (".yaml", ".yml"):
+        try:
+            import yaml
+        except ImportError:
+            raise ImportError(f"Reading {path} needs PyYAML.")
+        with open(path) as file:
+            return yaml.safe_load(file)
+    raise ValueError(f"{path} is not a {', '.join(MAP_EXTENSIONS)} file.")
+
+
+def load_register_map(path):
+    """Load and validate a register map file."""
+    try:
+        data = _read(path)
+    except (json.JSONDecodeError, UnicodeDecodeError) as error:
+        raise ValueError(f"{path}: {error}") from None
+    except Exception as error:
+        # tomllib and yaml raise their own parse errors
+        if type(error).__module__.split(".")[0] in (
+            "tomllib",
+            "tomli",
+            "yaml",
+        ):
+            raise ValueError(f"{path}: {error}") from None
+        raise
+    if not isinstance(data, dict):
+        raise ValueError(f"{path}: a register map is a table.")
+    unknown = set(data) - {
+        "family",
+        "version",
+        "description",
+        "match",
+        "input",
+        "holding",
+    }
+    if unknown:
+        raise ValueError(f"{path}: unknown keys {sorted(unknown)}.")
+    if not isinstance(data.get("input"), list):
+        raise ValueError(f"{path}: input must be a list of attributes.")
+    if not isinstance(data.get("holding", []), list):
+        raise ValueError(f"{path}: holding must be a list of attributes.")
+    return RegisterMap(
+        data.get("family"),
+        data["input"],
+        data.get("holding", []),
+        data.get("version", 1),
+        data.get("match"),
+        data.get("description", ""),
+        source=path,
+    )
+
+
+def load_register_maps(*paths):
+    """
+    Load register map files, and every map file in directories.
+
+    Families must be unique, a family defined twice is an error.
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(
+                os.path.join(path, name)
+                for name in sorted(os.listdir(path))
+                if name.lower().endswith(MAP_EXTENSIONS)
+            )
+        else:
+            files.append(path)
+
+    maps = []
+    families = {}
+    for path in files:
+        register_map = load_register_map(path)
+        if register_map.family in families:
+            raise ValueError(
+                f"{path}: family {register_map.family} is already "
+                f"defined in {families[register_map.family]}."
+            )
+        families[register_map.family] = path
+        maps.append(register_map)
+    return maps
+
+
+def select_register_map(maps, model_number, firmware, default=DEFAULT_MAP):
+    """
+    Register map for the hardware info of an inverter.
+
+    The map matching the most of model and firmware wins, the first of
+    them on a tie. Maps without match patterns match any inverter.
+    Returns default when no map matches.
+    """
+    best = None
+    best_score = -1
+    for register_map in maps:
+        score = register_map.matches(model_number, firmware)
+        if score is not None and score > best_score:
+            best = register_map
+            best_score = score
+    return default if best is None else best
+
+
+def save_register_map(register_map, path):
+    """Write a register map to a JSON file, as a start for a new family."""
+    with atomic_write(path) as file:
+        json.dump(register_map.as_dict(), file, indent=2, ensure_ascii=False)
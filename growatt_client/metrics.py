@@ -0,0 +1,173 @@
+"""Metrics hooks of the GrowattClient and an in-memory exporter."""
+import bisect
+
+__all__ = [
+    "BUCKETS",
+    "error_kind",
+    "MetricsHook",
+    "Histogram",
+    "InMemoryMetrics",
+    "render_prometheus",
+]
+
+# Histogram buckets, in seconds
+BUCKETS = (
+    0.0001,
+    0.0005,
+    0.001,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+)
+
+
+def error_kind(response):
+    """Classify a failed read response as timeout, crc or exception."""
+    if getattr(response, "exception_code", None) is not None:
+        return "exception"
+    text = str(getattr(response, "error", None) or response).lower()
+    if "crc" in text:
+        return "crc"
+    if "timeout" in text or "no response" in text:
+        return "timeout"
+    if "exception" in text:
+        return "exception"
+    return "error"
+
+
+class MetricsHook:
+    """
+    Receives the metrics of a GrowattClient.
+
+    Every method does nothing, subclasses override the ones they need.
+    Times are in seconds, block is the first register of a read request.
+    """
+
+    def on_connect(self, address, seconds):
+        pass
+
+    def on_read(self, address, block, seconds):
+        pass
+
+    def on_retry(self, address, block):
+        pass
+
+    def on_error(self, address, block, kind):
+        pass
+
+    def on_decode(self, address, seconds):
+        pass
+
+    def on_templates(self, address, seconds):
+        pass
+
+    def on_poll(self, address, seconds):
+        pass
+
+
+class Histogram:
+    """Cumulative histogram with fixed buckets."""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self):
+        """Yield (upper bound, count of values up to it)."""
+        total = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            yield bound, total
+
+
+class InMemoryMetrics(MetricsHook):
+    """Keeps histograms of the times and counters of retries and errors."""
+
+    def __init__(self, buckets=BUCKETS):
+        self._buckets = buckets
+        # Keyed by (metric name, label tuple)
+        self.histograms = {}
+        self.counters = {}
+
+    def _observe(self, name, labels, value):
+        key = (name, labels)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = Histogram(self._buckets)
+        histogram.observe(value)
+
+    def _count(self, name, labels):
+        key = (name, labels)
+        self.counters[key] = self.counters.get(key, 0) + 1
+
+    def on_connect(self, address, seconds):
+        self._observe("connect_seconds", (("address", address),), seconds)
+
+    def on_read(self, address, block, seconds):
+        self._observe(
+            "read_seconds", (("address", address), ("block", block)), seconds
+        )
+
+    def on_retry(self, address, block):
+        self._count("retries_total", (("address", address), ("block", block)))
+
+    def on_error(self, address, block, kind):
+        self._count(
+            "errors_total",
+            (("address", address), ("block", block), ("kind", kind)),
+        )
+
+    def on_decode(self, address, seconds):
+        self._observe("decode_seconds", (("address", address),), seconds)
+
+    def on_templates(self, address, seconds):
+        self._observe("template_seconds", (("address", address),), seconds)
+
+    def on_poll(self, address, seconds):
+        self._observe("poll_seconds", (("address", address),), seconds)
+
+
+def _labels(labels, extra=()):
+    labels = tuple(labels) + tuple(extra)
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels) + "}"
+
+
+def render_prometheus(metrics, prefix="growatt_"):
+    """Render InMemoryMetrics in the Prometheus text format."""
+    lines = []
+    seen = set()
+    for (name, labels), histogram in sorted(metrics.histograms.items()):
+        name = prefix + name
+        if name not in seen:
+            seen.add(name)
+            lines.append(f"# TYPE {name} histogram")
+        for bound, count in histogram.cumulative():
+            le = "+Inf" if bound == float("inf") else repr(float(bound))
+            lines.append(
+                f"{name}_bucket{_labels(labels, (('le', le),))} {count}"
+            )
+        lines.append(f"{name}_sum{_labels(labels)} {histogram.sum}")
+        lines.append(f"{name}_count{_labels(labels)} {histogram.count}")
+    for (name, labels), count in sorted(metrics.counters.items()):
+        name = prefix + name
+        if name not in seen:
+            seen.add(name)
+            lines.append(f"# TYPE {name} counter")
+        lines.append(f"{name}{_labels(labels)} {count}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,95 @@
+"""Plan the Modbus read requests needed for a set of attributes."""
+from .const import DEFAULT_GAP_COST, DOUBLE_BYTE, MAX_BLOCK_SIZE
+from .decoder import BlockDecoder
+
+__all__ = ["value_width", "plan_cost", "plan_registers"]
+
+_PLAN_CACHE = {}
+
+
+def value_width(value):
+    """Number of registers used by a value."""
+    return 2 if value["type"] == DOUBLE_BYTE else 1
+
+
+def plan_cost(plan, gap_cost=DEFAULT_GAP_COST):
+    """Cost of a plan, in registers read plus gap_cost per request."""
+    return sum(gap_cost + group["length"] for group in plan)
+
+
+def plan_registers(
+    values, max_block=MAX_BLOCK_SIZE, gap_cost=DEFAULT_GAP_COST
+):
+    """
+    Group register values into the cheapest set of read requests.
+
+    Every request costs gap_cost plus the number of registers it reads,
+    so two values end up in the same request when the unused registers
+    between them are cheaper than an extra round-trip. No request reads
+    more than max_block registers.
+
+    Returns a list of groups, {"pos", "length", "values", "decoder"},
+    sorted by position. Plans are cached per selection and must not be
+    modified.
+    """
+    key = (
+        # The decoders scale, so definitions differing in scale only
+        # get plans of their own
+        tuple(
+            (v["name"], v["pos"], v["type"], v.get("scale")) for v in values
+        ),
+        max_block,
+        gap_cost,
+    )
+    plan = _PLAN_CACHE.get(key)
+    if plan is None:
+        plan = _plan(values, max_block, gap_cost)
+        _PLAN_CACHE[key] = plan
+    return plan
+
+
+def _plan(values, max_block, gap_cost):
+    values = sorted(values, key=lambda x: x["pos"])
+    for value in values:
+        if value_width(value) > max_block:
+            raise ValueError(
+                f"{value['name']} does not fit in {max_block} registers."
+            )
+
+    # cost[i] is the cheapest plan for the first i values,
+    # start[i] where the last request of that plan begins
+    cost = [0] * (len(values) + 1)
+    start = [0] * (len(values) + 1)
+    for i in range(1, len(values) + 1):
+        end = 0
+        best = None
+        for j in range(i, 0, -1):
+            pos = values[j - 1]["pos"]
+            end = max(end, pos + value_width(values[j - 1]))
+            length = end - pos
+            if length > max_block:
+                break
+            c = cost[j - 1] + gap_cost + length
+            if best is None or c < best:
+                best = c
+                start[i] = j - 1
+        cost[i] = best
+
+    groups = []
+    i = len(values)
+    while i > 0:
+        j = start[i]
+        group_values = values[j:i]
+        pos = group_values[0]["pos"]
+        end = max(v["pos"] + value_width(v) for v in group_values)
+        groups.append(
+            {
+                "pos": pos,
+                "length": end - pos,
+                "values": group_values,
+                "decoder": BlockDecoder(pos, end - pos, group_values),
+            }
+        )
+        i = j
+    groups.reverse()
+    return groups
@@ -0,0 +1,109 @@
+"""Retry, timeout and circuit breaker policy of Modbus reads."""
+import random
+import time
+
+__all__ = ["ReadPolicy"]
+
+
+class ReadPolicy:
+    """
+    How a GrowattClient retries, times out and gives up on reads.
+
+    A failed read request is retried up to retries times, waiting
+    retry_delay seconds doubled on every attempt, up to retry_delay_max,
+    with up to jitter of it added or removed at random.
+
+    The timeout of every request follows its observed response time,
+    the smoothed latency plus four times its deviation, kept between
+    min_timeout and max_timeout. Until a request has answered it gets
+    max_timeout.
+
+    After failures_to_open polls in a row without any successful read
+    the circuit opens and polls fail at once for breaker_delay seconds,
+    doubled for every further failed trial up to breaker_delay_max.
+
+    With partial, a poll returns the attributes of the requests that
+    were read, leaving out the others, instead of failing as a whole.
+    """
+
+    def __init__(
+        self,
+        retries=2,
+        retry_delay=0.05,
+        retry_delay_max=1,
+        jitter=0.5,
+        min_timeout=0.1,
+        max_timeout=1,
+        failures_to_open=3,
+        breaker_delay=60,
+        breaker_delay_max=900,
+        partial=True,
+    ):
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.retry_delay_max = retry_delay_max
+        self.jitter = jitter
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.failures_to_open = failures_to_open
+        self.breaker_delay = breaker_delay
+        self.breaker_delay_max = breaker_delay_max
+        self.partial = partial
+
+        # Smoothed latency and deviation per request
+        self._latency = {}
+        self._failures = 0
+        self._open_until = 0.0
+        self._random = random.Random()
+
+    def retry_wait(self, attempt):
+        """Seconds to wait before retry number attempt, from 1."""
+        delay = min(
+            self.retry_delay * 2 ** (attempt - 1), self.retry_delay_max
+        )
+        return max(
+            0.0, delay * (1 + self.jitter * self._random.uniform(-1, 1))
+        )
+
+    def timeout(self, block):
+        """Timeout for a request starting at register block."""
+        latency = self._latency.get(block)
+        if latency is None:
+            return self.max_timeout
+        smoothed, deviation = latency
+        return min(
+            max(smoothed + 4 * deviation, self.min_timeout), self.max_timeout
+        )
+
+    def observe(self, block, seconds):
+        """Learn from the response time of a successful request."""
+        latency = self._latency.get(block)
+        if latency is None:
+            self._latency[block] = (seconds, seconds / 2)
+            return
+        smoothed, deviation = latency
+        deviation = 0.75 * deviation + 0.25 * abs(smoothed - seconds)
+        smoothed = 0.875 * smoothed + 0.125 * seconds
+        self._latency[block] = (smoothed, deviation)
+
+    def allow(self):
+        """Whether a poll may go to the inverter now."""
+        return time.monotonic() >= self._open_until
+
+    def is_open(self):
+        return not self.allow()
+
+    def record_poll(self, success):
+        """Record if a poll read anything, opening the circuit if not."""
+        if success:
+            self._failures = 0
+            self._open_until = 0.0
+            return
+        self._failures += 1
+        if self._failures >= self.failures_to_open:
+            delay = min(
+                self.breaker_delay
+                * 2 ** (self._failures - self.failures_to_open),
+                self.breaker_delay_max,
+            )
+            self._open_until = time.monotonic() + delay
@@ -0,0 +1,251 @@
+"""
+Record raw register reads to a file and replay them later.
+
+A recording starts with a small header followed by one record per read:
+
+    timestamp   float64, seconds since the epoch
+    slave       uint8
+    function    uint8, 3 for holding and 4 for input registers
+    address     uint16, first register
+    count       uint16, number of registers
+    registers   count * uint16
+
+All fields are big endian, the registers are stored as on the wire.
+Records are only appended, so they are sorted by time.
+"""
+import bisect
+import mmap
+import os
+import struct
+import time
+
+from .const import READ_HOLDING_REGISTERS, READ_INPUT_REGISTERS
+
+__all__ = [
+    "RegisterRecorder",
+    "RecordingClient",
+    "RegisterRecording",
+    "ReplayResponse",
+    "ReplayClient",
+]
+
+MAGIC = b"GWRR"
+VERSION = 1
+
+_HEADER = struct.Struct(">4sH")
+_RECORD = struct.Struct(">dBBHH")
+
+
+class RegisterRecorder:
+    """Append register reads to a recording file."""
+
+    def __init__(self, path):
+        self._file = open(path, "ab")
+        if self._file.tell() == 0:
+            self._file.write(_HEADER.pack(MAGIC, VERSION))
+
+    def record(self, slave, function, address, registers, timestamp=None):
+        if timestamp is None:
+            timestamp = time.time()
+        self._file.write(
+            _RECORD.pack(timestamp, slave, function, address, len(registers))
+            + struct.pack(f">{len(registers)}H", *registers)
+        )
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class RecordingClient:
+    """
+    Modbus client wrapper recording every successful read.
+
+    Writes are passed on to the client, without being recorded.
+    """
+
+    def __init__(self, client, recorder):
+        self._client = client
+        self._recorder = recorder
+
+    async def connect(self):
+        return await self._client.connect()
+
+    async def close(self, reconnect=False):
+        self._recorder.flush()
+        return await self._client.close()
+
+    async def read_input_registers(self, address, count=1, slave=0):
+        registers = await self._client.read_input_registers(
+            address, count, slave=slave
+        )
+        if not registers.isError():
+            self._recorder.record(
+                slave, READ_INPUT_REGISTERS, address, registers.registers
+            )
+        return registers
+
+    async def read_holding_registers(self, address, count=1, slave=0):
+        registers = await self._client.read_holding_registers(
+            address, count, slave=slave
+        )
+        if not registers.isError():
+            self._recorder.record(
+                slave, READ_HOLDING_REGISTERS, address, registers.registers
+            )
+        return registers
+
+    async def write_register(self, address, value, slave=0):
+        return await self._client.write_register(address, value, slave=slave)
+
+    async def write_registers(self, address, values, slave=0):
+        return await self._client.write_registers(address, values, slave=slave)
+
+
+class RegisterRecording:
+    """
+    Memory mapped, read only view of a recording.
+
+    Opening a recording walks the record headers once to index them,
+    the registers are only read when asked for.
+    """
+
+    def __init__(self, path):
+        self._file = open(path, "rb")
+        if os.fstat(self._file.fileno()).st_size == 0:
+            raise ValueError(f"{path} is empty.")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version = _HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a register recording.")
+
+        self._offsets = []
+        self._timestamps = []
+        offset = _HEADER.size
+        size = len(self._map)
+        while offset + _RECORD.size <= size:
+            timestamp, _, _, _, count = _RECORD.unpack_from(self._map, offset)
+            end = offset + _RECORD.size + count * 2
+            if end > size:
+                # Partly written last record
+                break
+            self._offsets.append(offset)
+            self._timestamps.append(timestamp)
+            offset = end
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def __getitem__(self, index):
+        """Return (timestamp, slave, function, address, registers)."""
+        timestamp, slave, function, address, count = self.header(index)
+        registers = struct.unpack_from(
+            f">{count}H", self._map, self._offsets[index] + _RECORD.size
+        )
+        return timestamp, slave, function, address, registers
+
+    def header(self, index):
+        """Return (timestamp, slave, function, address, count)."""
+        return _RECORD.unpack_from(self._map, self._offsets[index])
+
+    def payload(self, index):
+        """Return the register bytes of a record, without copying."""
+        offset = self._offsets[index] + _RECORD.size
+        count = _RECORD.unpack_from(self._map, self._offsets[index])[4]
+        return memoryview(self._map)[offset : offset + count * 2]
+
+    def timestamp(self, index):
+        return self._timestamps[index]
+
+    def seek(self, timestamp):
+        """Index of the first record at or after timestamp."""
+        return bisect.bisect_left(self._timestamps, timestamp)
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+
+class ReplayResponse:
+    """Read response served from a recording."""
+
+    def __init__(self, registers):
+        self.registers = registers
+
+    def isError(self):
+        return self.registers is None
+
+
+class ReplayClient:
+    """
+    Modbus client serving reads from a recording.
+
+    Reads are answered in recorded order: every request is served by the
+    next record, after the previous one served, for the same slave and
+    function that holds the requested registers. Holding registers are
+    looked up from the start of the recording, they are only read once
+    per process. A request that can not be served, and every write,
+    gets an error response.
+    """
+
+    def __init__(self, recording, start=None):
+        if not isinstance(recording, RegisterRecording):
+            recording = RegisterRecording(recording)
+        self._recording = recording
+        self._cursor = 0 if start is None else recording.seek(start)
+        self.timestamp = None
+
+    @property
+    def exhausted(self):
+        return self._cursor >= len(self._recording)
+
+    async def connect(self):
+        return True
+
+    async def close(self, reconnect=False):
+        pass
+
+    async def read_input_registers(self, address, count=1, slave=0):
+        index = self._find(
+            self._cursor, READ_INPUT_REGISTERS, address, count, slave
+        )
+        if index is None:
+            self._cursor = len(self._recording)
+            return ReplayResponse(None)
+        self._cursor = index + 1
+        return self._response(index, address, count)
+
+    async def read_holding_registers(self, address, count=1, slave=0):
+        index = self._find(0, READ_HOLDING_REGISTERS, address, count, slave)
+        if index is None:
+            return ReplayResponse(None)
+        return self._response(index, address, count)
+
+    async def write_register(self, address, value, slave=0):
+        return ReplayResponse(None)
+
+    async def write_registers(self, address, values, slave=0):
+        return ReplayResponse(None)
+
+    def _find(self, index, function, address, count, slave):
+        recording = self._recording
+        for index in range(index, len(recording)):
+            _, r_slave, r_function, r_address, r_count = recording.header(
+                index
+            )
+            if (
+                r_slave == slave
+                and r_function == function
+                and r_address <= address
+                and address + count <= r_address + r_count
+            ):
+                return index
+        return None
+
+    def _response(self, index, address, count):
+        timestamp, _, _, r_address, registers = self._recording[index]
+        self.timestamp = timestamp
+        start = address - r_address
+        return ReplayResponse(list(registers[start : start + count]))
@@ -0,0 +1,261 @@
+"""
+Share a serial port and the polled data between processes.
+
+PortLock is an advisory lock per serial port, held while a client has
+the port open, so clients in separate processes take turns instead of
+mixing their frames.
+
+A shared snapshot is a file in shared memory, /dev/shm by default,
+written by the poller and mapped by any number of readers:
+
+    magic           b"GWSS"
+    header length   uint32
+    header          JSON, the attribute names, padded with spaces
+    sequence        uint64, odd while the values are being written
+    timestamp       float64
+    values          float64 per attribute
+
+All numbers are little endian and the sequence is 8 byte aligned. The
+sequence makes it a seqlock: the poller never waits for readers, and
+readers retry the rare read that overlapped a write.
+"""
+import asyncio
+import json
+import mmap
+import os
+import struct
+import tempfile
+import time
+from array import array
+
+from .export import _from_bytes, _to_bytes
+from .files import atomic_write
+from .growatt import PortException
+from .snapshot import Snapshot, SnapshotSchema
+
+__all__ = [
+    "DEFAULT_LOCK_DIR",
+    "DEFAULT_SHARED_DIR",
+    "lock_path",
+    "PortLock",
+    "shared_path",
+    "SharedSnapshotWriter",
+    "SharedSnapshotReader",
+]
+
+MAGIC = b"GWSS"
+DEFAULT_LOCK_DIR = "/run/lock" if os.path.isdir("/run/lock") else None
+DEFAULT_SHARED_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else None
+
+_LENGTH = struct.Struct("<I")
+_SEQUENCE = struct.Struct("<Q")
+
+
+def lock_path(port, directory=DEFAULT_LOCK_DIR):
+    """Lock file of a serial port."""
+    name = port.strip("/").replace("/", "_")
+    return os.path.join(
+        directory or tempfile.gettempdir(), f"growatt-{name}.lock"
+    )
+
+
+class PortLock:
+    """
+    Advisory lock of a serial port, shared by all processes using it.
+
+    The lock is a flock on a lock file, released by the kernel when the
+    holding process exits. acquire waits up to timeout seconds, then
+    raises PortException. Locks need fcntl, so a POSIX system.
+    """
+
+    def __init__(self, port, directory=DEFAULT_LOCK_DIR, timeout=30):
+        self.path = lock_path(port, directory)
+        self.timeout = timeout
+        self._fd = None
+
+    @property
+    def locked(self):
+        return self._fd is not None
+
+    def try_acquire(self):
+        """Take the lock if it is free, returns whether it was taken."""
+        if self._fd is not None:
+            return True
+        # Not on Windows, imported here so the package still imports
+        import fcntl
+
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o666)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        self._fd = fd
+        return True
+
+    async def acquire(self):
+        """Wait for the lock, polling so the event loop keeps running."""
+        deadline = time.monotonic() + self.timeout
+        delay = 0.01
+        while not self.try_acquire():
+            if time.monotonic() >= deadline:
+                raise PortException(f"Port lock {self.path} is held.")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.25)
+
+    def release(self):
+        if self._fd is not None:
+            import fcntl
+
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.release()
+
+
+def shared_path(port, address, directory=DEFAULT_SHARED_DIR):
+    """Shared snapshot file of an inverter."""
+    name = port.strip("/").replace("/", "_")
+    return os.path.join(
+        directory or tempfile.gettempdir(), f"growatt-{name}-{address}.snap"
+    )
+
+
+class SharedSnapshotWriter:
+    """
+    Publish snapshots of a schema to a shared snapshot file.
+
+    The file is created for the schema, replacing any older one, and
+    removed again on close.
+    """
+
+    def __init__(self, path, schema):
+        self.path = path
+        self.schema = schema
+        header = json.dumps({"names": list(schema.names)}).encode()
+        header += b" " * (-(len(MAGIC) + _LENGTH.size + len(header)) % 8)
+        self._offset = len(MAGIC) + _LENGTH.size + len(header)
+        size = self._offset + _SEQUENCE.size + 8 * (len(schema) + 1)
+
+        # Readers only ever see a complete file
+        with atomic_write(path, "w+b") as file:
+            file.write(MAGIC + _LENGTH.pack(len(header)) + header)
+            file.write(bytes(size - file.tell()))
+            file.flush()
+            self._map = mmap.mmap(file.fileno(), size)
+        self._sequence = 0
+
+    def write(self, snapshot, timestamp=None):
+        """Publish a Snapshot, or a data dict."""
+        if isinstance(snapshot, Snapshot) and snapshot.schema == self.schema:
+            values = snapshot.values
+            if timestamp is None:
+                timestamp = snapshot.timestamp
+        else:
+            values = self.schema.make(snapshot).values
+        if timestamp is None or timestamp != timestamp:
+            timestamp = time.time()
+
+        payload = _to_bytes(array("d", [timestamp]) + array("d", values))
+        offset = self._offset
+        start = offset + _SEQUENCE.size
+        # Whole slices only, pack_into clears its bytes before packing
+        self._sequence += 1
+        self._map[offset:start] = _SEQUENCE.pack(self._sequence)
+        self._map[start : start + len(payload)] = payload
+        self._sequence += 1
+        self._map[offset:start] = _SEQUENCE.pack(self._sequence)
+
+    @property
+    def version(self):
+        return self._sequence // 2
+
+    def close(self, remove=True):
+        self._map.close()
+        if remove:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+
+
+class SharedSnapshotReader:
+    """
+    Read the latest snapshot from a shared snapshot file.
+
+    The file is mapped once and mapped again when the writer replaced
+    it, for example after a restart with other attributes.
+    """
+
+    def __init__(self, path, retries=100):
+        self.path = path
+        self.retries = retries
+        self._map = None
+        self._inode = None
+        self.schema = None
+
+    def _open(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            self.close()
+            return False
+        if stat.st_ino == self._inode:
+            return True
+        self.close()
+        with open(self.path, "rb") as file:
+            data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if data[:4] != MAGIC:
+            data.close()
+            raise ValueError(f"{self.path} is not a shared snapshot.")
+        (length,) = _LENGTH.unpack_from(data, 4)
+        start = 4 + _LENGTH.size
+        header = json.loads(data[start : start + length])
+        self.schema = SnapshotSchema(header["names"])
+        self._offset = start + length
+        self._map = data
+        self._inode = stat.st_ino
+        return True
+
+    def read(self):
+        """
+        Return the latest Snapshot, or None before the first write.
+
+        The snapshot timestamp is the one given by the writer, and
+        version() the number of snapshots written.
+        """
+        if not self._open():
+            return None
+        offset = self._offset
+        start = offset + _SEQUENCE.size
+        end = start + 8 * (len(self.schema) + 1)
+        for _ in range(self.retries):
+            (sequence,) = _SEQUENCE.unpack_from(self._map, offset)
+            if sequence & 1:
+                time.sleep(0)
+                continue
+            payload = self._map[start:end]
+            if _SEQUENCE.unpack_from(self._map, offset)[0] == sequence:
+                if sequence == 0:
+                    return None
+                values = _from_bytes(payload)
+                return Snapshot(self.schema, values[1:], values[0])
+        raise BlockingIOError(f"{self.path} kept changing while read.")
+
+    def version(self):
+        """Number of snapshots written, without reading the values."""
+        if not self._open():
+            return 0
+        return _SEQUENCE.unpack_from(self._map, self._offset)[0] // 2
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+            self._inode = None
@@ -0,0 +1,397 @@
+"""
+Modbus RTU simulator of Growatt inverters, for tests and load testing.
+
+The simulated inverters serve the input registers of the attribute
+definitions and holding registers, which can also be written. They are
+reached either in memory with SimulatorClient, used by GrowattClient in
+place of the serial client, or over a pseudo terminal with serve_pty,
+which gives a device path for the real serial client.
+"""
+import asyncio
+import os
+import random
+import struct
+import time
+import tty
+
+from .const import (
+    ATTRIBUTES,
+    DEFAULT_ADDRESS,
+    DOUBLE_BYTE,
+    READ_HOLDING_REGISTERS,
+    READ_INPUT_REGISTERS,
+    WRITE_MULTIPLE_REGISTERS,
+    WRITE_SINGLE_REGISTER,
+)
+
+__all__ = [
+    "ILLEGAL_FUNCTION",
+    "ILLEGAL_DATA_ADDRESS",
+    "crc16",
+    "add_crc",
+    "check_crc",
+    "frame_time",
+    "InverterSimulator",
+    "SimulatedBus",
+    "SimulatorResponse",
+    "SimulatorClient",
+    "serve_pty",
+]
+
+# Modbus exception codes
+ILLEGAL_FUNCTION = 1
+ILLEGAL_DATA_ADDRESS = 2
+
+_REQUEST = struct.Struct(">BBHH")
+
+
+def crc16(frame):
+    """Modbus RTU CRC of a frame."""
+    crc = 0xFFFF
+    for byte in frame:
+        crc ^= byte
+        for _ in range(8):
+            if crc & 1:
+                crc = (crc >> 1) ^ 0xA001
+            else:
+                crc >>= 1
+    return crc
+
+
+def add_crc(frame):
+    return frame + struct.pack("<H", crc16(frame))
+
+
+def check_crc(frame):
+    return (
+        len(frame) > 2
+        and crc16(frame[:-2]) == struct.unpack("<H", frame[-2:])[0]
+    )
+
+
+def _request_size(buffer):
+    """Size of the request frame at the start of buffer."""
+    if buffer[1] == WRITE_MULTIPLE_REGISTERS and len(buffer) > _REQUEST.size:
+        # Followed by the byte count and the values
+        return _REQUEST.size + 1 + buffer[_REQUEST.size] + 2
+    return _REQUEST.size + 2
+
+
+def frame_time(size, baudrate):
+    """Seconds to send a frame, 11 bits per byte plus 3.5 bytes silence."""
+    return (size + 3.5) * 11 / baudrate
+
+
+def _string_registers(text, length):
+    text = text.ljust(length * 2)[: length * 2]
+    return [
+        (ord(text[i]) << 8) + ord(text[i + 1]) for i in range(0, len(text), 2)
+    ]
+
+
+class InverterSimulator:
+    """
+    One simulated inverter.
+
+    values maps attribute names to a number, or to a callable taking
+    the seconds since the simulator started and returning a number.
+    registers does the same for raw input register positions.
+    input_ranges limits the input registers answered to a list of
+    (first, last) register ranges, as on inverters not having them all.
+    """
+
+    def __init__(
+        self,
+        address=DEFAULT_ADDRESS,
+        attribute_defs=ATTRIBUTES,
+        values=None,
+        registers=None,
+        serial_number="SIM0000001",
+        firmware="SM1.0",
+        model=0x00100000,
+        input_ranges=None,
+    ):
+        self.address = address
+        self.input_ranges = input_ranges
+        self._values = {}
+        for attr in attribute_defs:
+            if "pos" in attr:
+                self._values[attr["name"]] = attr
+        self._generators = dict(values or {})
+        self._registers = dict(registers or {})
+        self._start = time.monotonic()
+
+        self.holding = [0] * 1125
+        self.holding[9:12] = _string_registers(firmware, 3)
+        self.holding[23:28] = _string_registers(serial_number, 5)
+        self.holding[28] = model >> 16
+        self.holding[29] = model & 0xFFFF
+
+    def set_value(self, name, value):
+        """Set an attribute to a number or a generator."""
+        self._generators[name] = value
+
+    def input_registers(self, address, count):
+        """Current input registers, unknown registers read as 0."""
+        elapsed = time.monotonic() - self._start
+        registers = [0] * count
+        for name, gen in self._generators.items():
+            attr = self._values.get(name)
+            if attr is None:
+                continue
+            value = gen(elapsed) if callable(gen) else gen
+            raw = int(round(value / attr["scale"])) if attr["scale"] else 0
+            if attr["type"] == DOUBLE_BYTE:
+                words = [(raw >> 16) & 0xFFFF, raw & 0xFFFF]
+            else:
+                words = [raw & 0xFFFF]
+            for i, word in enumerate(words):
+                index = attr["pos"] + i - address
+                if 0 <= index < count:
+                    registers[index] = word
+        for pos, gen in self._registers.items():
+            index = pos - address
+            if 0 <= index < count:
+                value = gen(elapsed) if callable(gen) else gen
+                registers[index] = int(value) & 0xFFFF
+        return registers
+
+    def holding_registers(self, address, count):
+        if address + count > len(self.holding):
+            return None
+        return self.holding[address : address + count]
+
+    def write(self, address, values):
+        """Write holding registers, returns an exception code or None."""
+        if address + len(values) > len(self.holding):
+            return ILLEGAL_DATA_ADDRESS
+        self.holding[address : address + len(values)] = values
+        return None
+
+    def handle(self, function, address, count):
+        """Answer a read request, with registers or an exception code."""
+        if function == READ_INPUT_REGISTERS:
+            if self.input_ranges is not None and not any(
+                first <= address and address + count - 1 <= last
+                for first, last in self.input_ranges
+            ):
+                return ILLEGAL_DATA_ADDRESS
+            return self.input_registers(address, count)
+        if function == READ_HOLDING_REGISTERS:
+            registers = self.holding_registers(address, count)
+            return ILLEGAL_DATA_ADDRESS if registers is None else registers
+        return ILLEGAL_FUNCTION
+
+
+class SimulatedBus:
+    """
+    Simulated inverters sharing one RS485 line.
+
+    crc_error_rate is the share of responses sent with a broken CRC.
+    With a baudrate, clients at another baud rate get no answer.
+    """
+
+    def __init__(
+        self, inverters=None, crc_error_rate=0.0, seed=None, baudrate=None
+    ):
+        self._inverters = {}
+        for inverter in inverters or [InverterSimulator()]:
+            self.add_inverter(inverter)
+        self.crc_error_rate = crc_error_rate
+        self.baudrate = baudrate
+        self._random = random.Random(seed)
+        self.requests = 0
+
+    def add_inverter(self, inverter):
+        self._inverters[inverter.address] = inverter
+
+    def get_inverter(self, address):
+        return self._inverters[address]
+
+    def handle_frame(self, frame):
+        """
+        Answer a Modbus RTU request frame.
+
+        Returns the response frame, or None when no inverter answers.
+        """
+        self.requests += 1
+        if len(frame) < _REQUEST.size + 2 or not check_crc(frame):
+            return None
+        slave, function, address, count = _REQUEST.unpack_from(frame)
+        inverter = self._inverters.get(slave)
+        if inverter is None:
+            return None
+
+        if function in (WRITE_SINGLE_REGISTER, WRITE_MULTIPLE_REGISTERS):
+            if function == WRITE_SINGLE_REGISTER:
+                values = [count]
+            else:
+                values = list(
+                    struct.unpack_from(f">{count}H", frame, _REQUEST.size + 1)
+                )
+            result = inverter.write(address, values)
+            if result is None:
+                # Write responses echo the start of the request
+                response = add_crc(frame[: _REQUEST.size])
+            else:
+                response = add_crc(
+                    struct.pack(">BBB", slave, function | 0x80, result)
+                )
+            return self._corrupt(response)
+
+        result = inverter.handle(function, address, count)
+        if isinstance(result, int):
+            response = add_crc(
+                struct.pack(">BBB", slave, function | 0x80, result)
+            )
+        else:
+            response = add_crc(
+                struct.pack(
+                    f">BBB{count}H", slave, function, count * 2, *result
+                )
+            )
+        return self._corrupt(response)
+
+    def _corrupt(self, response):
+        """Break the CRC of a share crc_error_rate of the responses."""
+        if self.crc_error_rate and self._random.random() < self.crc_error_rate:
+            response = response[:-1] + bytes([response[-1] ^ 0xFF])
+        return response
+
+
+class SimulatorResponse:
+    """Read response of the SimulatorClient."""
+
+    def __init__(self, registers=None, error=None):
+        self.registers = registers
+        self.error = error
+
+    def isError(self):
+        return self.error is not None
+
+
+class SimulatorClient:
+    """
+    In memory Modbus client talking to a SimulatedBus.
+
+    Requests go through real RTU frames. Every request takes the time
+    to send both frames at baudrate plus latency, a request without
+    answer takes timeout. A baudrate of None sends frames instantly.
+    The frames and bytes sent and received are counted.
+    """
+
+    def __init__(self, bus, baudrate=9600, latency=0.0, timeout=1):
+        self._bus = bus
+        self.baudrate = baudrate
+        self.latency = latency
+        self.timeout = timeout
+        self.connected = False
+        self.frames = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+
+    async def connect(self):
+        self.connected = True
+        return True
+
+    async def close(self, reconnect=False):
+        self.connected = False
+
+    async def read_input_registers(self, address, count=1, slave=0):
+        return await self._read(READ_INPUT_REGISTERS, address, count, slave)
+
+    async def read_holding_registers(self, address, count=1, slave=0):
+        return await self._read(READ_HOLDING_REGISTERS, address, count, slave)
+
+    async def write_register(self, address, value, slave=0):
+        request = _REQUEST.pack(slave, WRITE_SINGLE_REGISTER, address, value)
+        return await self._request(request, 0)
+
+    async def write_registers(self, address, values, slave=0):
+        count = len(values)
+        request = _REQUEST.pack(
+            slave, WRITE_MULTIPLE_REGISTERS, address, count
+        ) + struct.pack(f">B{count}H", count * 2, *values)
+        return await self._request(request, 0)
+
+    async def _read(self, function, address, count, slave):
+        request = _REQUEST.pack(slave, function, address, count)
+        return await self._request(request, count)
+
+    async def _request(self, request, count):
+        """Send a request frame, count is the number of registers read."""
+        request = add_crc(request)
+        self.frames += 1
+        self.bytes_sent += len(request)
+        response = self._bus.handle_frame(request)
+        if self._bus.baudrate not in (None, self.baudrate):
+            response = None
+        if response is None:
+            await asyncio.sleep(self.timeout)
+            return SimulatorResponse(error="timeout")
+        self.bytes_received += len(response)
+
+        delay = self.latency
+        if self.baudrate is not None:
+            delay += frame_time(len(request), self.baudrate) + frame_time(
+                len(response), self.baudrate
+            )
+        await asyncio.sleep(delay)
+        if not check_crc(response):
+            return SimulatorResponse(error="crc")
+        if response[1] & 0x80:
+            return SimulatorResponse(error=f"exception {response[2]}")
+        if not count:
+            return SimulatorResponse([])
+        registers = struct.unpack_from(f">{count}H", response, 3)
+        return SimulatorResponse(list(registers))
+
+
+async def serve_pty(bus, baudrate=9600, latency=0.0):
+    """
+    Serve a SimulatedBus on a pseudo terminal.
+
+    Returns the device path to connect to, and a task serving the
+    requests until it is cancelled.
+    """
+    master, slave = os.openpty()
+    tty.setraw(master)
+    tty.setraw(slave)
+    path = os.ttyname(slave)
+    os.set_blocking(master, False)
+
+    async def serve():
+        loop = asyncio.get_running_loop()
+        received = asyncio.Event()
+        loop.add_reader(master, received.set)
+        buffer = b""
+        try:
+            while True:
+                await received.wait()
+                received.clear()
+                try:
+                    buffer += os.read(master, 256)
+                except BlockingIOError:
+                    continue
+                while len(buffer) >= _REQUEST.size + 2:
+                    size = _request_size(buffer)
+                    if len(buffer) < size:
+                        break
+                    frame = buffer[:size]
+                    buffer = buffer[size:]
+                    response = bus.handle_frame(frame)
+                    if response is None:
+                        buffer = b""
+                        continue
+                    await asyncio.sleep(
+                        frame_time(len(frame), baudrate)
+                        + latency
+                        + frame_time(len(response), baudrate)
+                    )
+                    os.write(master, response)
+        finally:
+            loop.remove_reader(master)
+            os.close(master)
+            os.close(slave)
+
+    return path, asyncio.ensure_future(serve())
@@ -0,0 +1,184 @@
+"""Compact snapshots of polled data and a ring buffer of them."""
+from array import array
+
+__all__ = ["NAN", "SnapshotSchema", "Snapshot", "SnapshotBuffer"]
+
+NAN = float("nan")
+
+
+class SnapshotSchema:
+    """
+    Names of the attributes in a snapshot, and their column index.
+
+    A schema is shared by all snapshots of a client and never changes.
+    """
+
+    __slots__ = ("names", "index")
+
+    def __init__(self, names):
+        self.names = tuple(names)
+        self.index = {name: i for i, name in enumerate(self.names)}
+
+    def __len__(self):
+        return len(self.names)
+
+    def __eq__(self, other):
+        return isinstance(other, SnapshotSchema) and self.names == other.names
+
+    def __hash__(self):
+        return hash(self.names)
+
+    def make(self, data, timestamp=NAN):
+        """Snapshot of a data dict, missing attributes are NaN."""
+        get = data.get
+        return Snapshot(
+            self,
+            array("d", [get(name, NAN) for name in self.names]),
+            timestamp,
+        )
+
+
+class Snapshot:
+    """
+    Values of one poll, stored as an array of doubles.
+
+    Values are read by name, by column index or as attributes, and
+    to_dict() gives the dict returned by async_update.
+    """
+
+    __slots__ = ("schema", "values", "timestamp")
+
+    def __init__(self, schema, values, timestamp=NAN):
+        self.schema = schema
+        self.values = values
+        self.timestamp = timestamp
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return self.values[self.schema.index[key]]
+        return self.values[key]
+
+    def __getattr__(self, name):
+        # Slots not set yet, as while copying or unpickling, must not
+        # look themselves up through the schema
+        if name.startswith("_") or name in Snapshot.__slots__:
+            raise AttributeError(name)
+        try:
+            return self.values[self.schema.index[name]]
+        except KeyError:
+            raise AttributeError(name)
+
+    def __reduce__(self):
+        return Snapshot, (self.schema, self.values, self.timestamp)
+
+    def __len__(self):
+        return len(self.values)
+
+    def __iter__(self):
+        return iter(self.schema.names)
+
+    def __contains__(self, name):
+        return name in self.schema.index
+
+    def keys(self):
+        return self.schema.names
+
+    def items(self):
+        return zip(self.schema.names, self.values)
+
+    def get(self, name, default=None):
+        index = self.schema.index.get(name)
+        return default if index is None else self.values[index]
+
+    def to_dict(self):
+        return dict(zip(self.schema.names, self.values))
+
+    def __repr__(self):
+        return f"Snapshot({self.timestamp}, {self.to_dict()})"
+
+
+class SnapshotBuffer:
+    """
+    The most recent snapshots of a schema, stored per column.
+
+    Every column, and the timestamps, is a preallocated array of
+    doubles used as a ring, so memory does not grow with the number of
+    snapshots appended.
+    """
+
+    def __init__(self, schema, capacity):
+        if capacity < 1:
+            raise ValueError("Capacity must be at least 1.")
+        self.schema = schema
+        self.capacity = capacity
+        self._columns = [
+            array("d", [NAN]) * capacity for _ in range(len(schema))
+        ]
+        self._timestamps = array("d", [NAN]) * capacity
+        self._next = 0
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def append(self, snapshot, timestamp=None):
+        """Append a Snapshot, or a data dict."""
+        if isinstance(snapshot, Snapshot):
+            if snapshot.schema != self.schema:
+                raise ValueError("Snapshot has another schema.")
+            values = snapshot.values
+            if timestamp is None:
+                timestamp = snapshot.timestamp
+        else:
+            values = [snapshot.get(name, NAN) for name in self.schema.names]
+        i = self._next
+        for column, value in zip(self._columns, values):
+            column[i] = value
+        self._timestamps[i] = NAN if timestamp is None else timestamp
+        self._next = (i + 1) % self.capacity
+        self._size = min(self._size + 1, self.capacity)
+
+    def _order(self, data):
+        """Values of a ring array, oldest first."""
+        if self._size < self.capacity:
+            return data[: self._size]
+        return data[self._next :] + data[: self._next]
+
+    def column(self, name):
+        """Values of an attribute, oldest first, as an array."""
+        return self._order(self._columns[self.schema.index[name]])
+
+    def timestamps(self):
+        return self._order(self._timestamps)
+
+    def __getitem__(self, index):
+        """Snapshot by position, 0 is the oldest, -1 the newest."""
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError(index)
+        i = (self._next - self._size + index) % self.capacity
+        return Snapshot(
+            self.schema,
+            array("d", [column[i] for column in self._columns]),
+            self._timestamps[i],
+        )
+
+    def latest(self):
+        return self[-1] if self._size else None
+
+    def _values(self, name):
+        return [v for v in self.column(name) if v == v]
+
+    def mean(self, name):
+        """Mean of an attribute, NaN values skipped."""
+        values = self._values(name)
+        return sum(values) / len(values) if values else NAN
+
+    def min(self, name):
+        values = self._values(name)
+        return min(values) if values else NAN
+
+    def max(self, name):
+        values = self._values(name)
+        return max(values) if values else NAN
@@ -0,0 +1,185 @@
+"""Compile the templates of calculated attributes."""
+import ast
+import re
+
+__all__ = [
+    "CompiledTemplate",
+    "template_inputs",
+    "resolve_attributes",
+    "apply_profile",
+    "compile_templates",
+    "TemplateException",
+]
+
+_FIELD = re.compile(r"\{(\w+)\}")
+
+_ALLOWED_NODES = (
+    ast.Expression,
+    ast.BinOp,
+    ast.UnaryOp,
+    ast.BoolOp,
+    ast.Compare,
+    ast.IfExp,
+    ast.Name,
+    ast.Load,
+    ast.Constant,
+    ast.Add,
+    ast.Sub,
+    ast.Mult,
+    ast.Div,
+    ast.USub,
+    ast.UAdd,
+    ast.Not,
+    ast.And,
+    ast.Or,
+    ast.Eq,
+    ast.NotEq,
+    ast.Lt,
+    ast.LtE,
+    ast.Gt,
+    ast.GtE,
+)
+
+_NO_BUILTINS = {"__builtins__": {}}
+
+# Compiled templates by name and template, they hold no state
+_TEMPLATE_CACHE = {}
+
+
+class CompiledTemplate:
+    """A template parsed and compiled once, evaluated on every poll."""
+
+    def __init__(self, name, template):
+        self.name = name
+        self.template = template
+        expression = _FIELD.sub(r"\1", template)
+        try:
+            tree = ast.parse(expression, mode="eval")
+        except SyntaxError as error:
+            raise TemplateException(f"Template of {name} is invalid: {error}")
+        for node in ast.walk(tree):
+            if not isinstance(node, _ALLOWED_NODES):
+                raise TemplateException(
+                    f"Template of {name} is not allowed to use "
+                    f"{type(node).__name__}."
+                )
+            if isinstance(node, ast.Constant) and not isinstance(
+                node.value, (int, float)
+            ):
+                raise TemplateException(
+                    f"Template of {name} has a non numeric constant."
+                )
+        self.inputs = sorted(
+            {n.id for n in ast.walk(tree) if isinstance(n, ast.Name)}
+        )
+        self._code = compile(tree, f"<template {name}>", "eval")
+
+    def evaluate(self, data):
+        """Evaluate the template with values from data."""
+        return round(eval(self._code, _NO_BUILTINS, data), 1)
+
+
+def template_inputs(template):
+    """Names of the attributes used by a template."""
+    return _FIELD.findall(template)
+
+
+def resolve_attributes(names, attribute_defs):
+    """
+    Select attributes by name, together with everything they depend on.
+
+    A template needs its inputs, which can be templates themselves, so
+    these are added until every input is selected. Unknown names are
+    ignored.
+    """
+    defs = {attr["name"]: attr for attr in attribute_defs}
+    selected = {}
+    pending = [name for name in names if name in defs]
+    while pending:
+        name = pending.pop()
+        if name in selected or name not in defs:
+            continue
+        attr = defs[name]
+        selected[name] = attr
+        if "template" in attr:
+            pending.extend(template_inputs(attr["template"]))
+    return [attr for attr in attribute_defs if attr["name"] in selected]
+
+
+def apply_profile(attribute_defs, profile):
+    """
+    Leave out the attributes a capability profile marks unsupported.
+
+    Templates using an unsupported attribute, directly or through other
+    templates, are left out too.
+    """
+    removed = set(profile.get("unsupported", ()))
+    defs = [attr for attr in attribute_defs if attr["name"] not in removed]
+    changed = True
+    while changed:
+        changed = False
+        for attr in defs:
+            if "template" in attr and not removed.isdisjoint(
+                template_inputs(attr["template"])
+            ):
+                removed.add(attr["name"])
+                changed = True
+        defs = [attr for attr in defs if attr["name"] not in removed]
+    return defs
+
+
+def compile_templates(templates, available):
+    """
+    Compile templates, ordered so every template comes after its inputs.
+
+    available holds the names of the attributes read from registers,
+    templates may use those and each other. Raises TemplateException
+    when an input is missing or the templates depend on each other in
+    a cycle.
+    """
+    compiled = {}
+    for value in templates:
+        key = (value["name"], value["template"])
+        templ = _TEMPLATE_CACHE.get(key)
+        if templ is None:
+            templ = CompiledTemplate(*key)
+            _TEMPLATE_CACHE[key] = templ
+        compiled[value["name"]] = templ
+
+    for templ in compiled.values():
+        for field in templ.inputs:
+            if field not in available and field not in compiled:
+                raise TemplateException(
+                    f"Template of {templ.name} uses {field}, "
+                    "which is not selected."
+                )
+
+    ordered = []
+    state = {}
+
+    def visit(templ):
+        if state.get(templ.name) == "done":
+            return
+        if state.get(templ.name) == "visiting":
+            raise TemplateException(
+                f"Template of {templ.name} depends on itself."
+            )
+        state[templ.name] = "visiting"
+        for field in templ.inputs:
+            if field in compiled:
+                visit(compiled[field])
+        state[templ.name] = "done"
+        ordered.append(templ)
+
+    for templ in compiled.values():
+        visit(templ)
+    return ordered
+
+
+class TemplateException(Exception):
+    """Raised when a template can not be compiled."""
+
+    def __init__(self, status):
+        """Initialize."""
+        super(TemplateException, self).__init__(status)
+        self.status = status
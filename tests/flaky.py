@@ -0,0 +1,89 @@
+"""Simulator clients failing on demand, shared by the tests."""
+import asyncio
+
+from pymodbus.exceptions import ConnectionException
+
+from growatt_client.simulator import SimulatorClient, SimulatorResponse
+
+
+class FlakyClient(SimulatorClient):
+    """
+    Simulator client failing the next input register reads.
+
+    Like the pymodbus client, it does not read while closed.
+    """
+
+    def __init__(self, bus, **kwargs):
+        super().__init__(bus, baudrate=None, **kwargs)
+        self.connects = 0
+        self.reads = 0
+        # "raise", "slow", "short" or an error per read still to fail
+        self.failures = []
+
+    async def connect(self):
+        self.connects += 1
+        return await super().connect()
+
+    async def read_input_registers(self, address, count=1, slave=0):
+        self.reads += 1
+        if not self.connected:
+            raise ConnectionException("Not connected")
+        if self.failures:
+            failure = self.failures.pop(0)
+            if failure == "raise":
+                self.connected = False
+                raise ConnectionException("line dropped")
+            if failure == "slow":
+                await asyncio.sleep(1)
+            if failure == "short":
+                response = await super().read_input_registers(
+                    address, count, slave
+                )
+                return SimulatorResponse(response.registers[:-1])
+            return SimulatorResponse(error=failure)
+        return await super().read_input_registers(address, count, slave)
+
+
+class LateReplyClient(SimulatorClient):
+    """
+    Simulator client matching replies to requests by slave address.
+
+    Like the pymodbus RTU client, a reply arriving after its request was
+    abandoned answers the next request to the same slave, unless the
+    port was closed in between. Replies take reply_time seconds, delays
+    holds how much later the next replies come.
+    """
+
+    def __init__(self, bus, reply_time=0.01, **kwargs):
+        super().__init__(bus, baudrate=None, **kwargs)
+        self.reply_time = reply_time
+        self.delays = []
+        self.connects = 0
+        self._session = 0
+        self._waiting = {}
+
+    async def connect(self):
+        self.connects += 1
+        return await super().connect()
+
+    async def close(self, reconnect=False):
+        self._session += 1
+        self._waiting.clear()
+        await super().close(reconnect)
+
+    async def _request(self, request, count):
+        response = await super()._request(request, count)
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        slave = request[0]
+        self._waiting[slave] = future
+        delay = self.reply_time + (self.delays.pop(0) if self.delays else 0)
+        loop.call_later(delay, self._reply, self._session, slave, response)
+        return await future
+
+    def _reply(self, session, slave, response):
+        if session != self._session:
+            return
+        future = self._waiting.pop(slave, None)
+        if future is not None and not future.done():
+            future.set_result(response)
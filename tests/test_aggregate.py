@@ -0,0 +1,79 @@
+import math
+
+import pytest
+
+from growatt_client import WindowAggregator, merge_summaries
+
+PV = "photovoltaics"
+
+
+def _aggregator(length, **kwargs):
+    return WindowAggregator(length, names=[PV], counters={}, **kwargs)
+
+
+def _feed(aggregator, power, start, end, every=60):
+    summaries = []
+    for timestamp in range(start, end + 1, every):
+        summaries += aggregator.add({PV: power(timestamp)}, timestamp)
+    return summaries
+
+
+def test_power_is_integrated_to_energy():
+    aggregator = _aggregator(3600)
+    (summary,) = _feed(aggregator, lambda t: 2.0, 0, 3600)
+    assert (summary["start"], summary["end"]) == (0, 3600)
+    stats = summary["attributes"][PV]
+    assert stats["energy"] == pytest.approx(2.0)
+    assert stats["coverage"] == 1.0
+    assert stats["samples"] == 60
+    assert stats["mean"] == stats["min"] == stats["max"] == 2.0
+
+
+def test_ramp_is_integrated_over_pane_boundaries():
+    aggregator = _aggregator(1800, max_gap=1000)
+    # 0 to 2 kW over the hour, sampled across the pane boundary
+    summaries = _feed(aggregator, lambda t: t / 1800, 0, 4200, every=700)
+    energy = sum(s["attributes"][PV]["energy"] for s in summaries)
+    assert [s["end"] for s in summaries] == [1800, 3600]
+    assert energy == pytest.approx(1.0)
+
+
+def test_gaps_are_not_integrated():
+    aggregator = _aggregator(3600, max_gap=300)
+    aggregator.add({PV: 1.0}, 0)
+    aggregator.add({PV: 1.0}, 60)
+    aggregator.add({PV: 1.0}, 460)
+    aggregator.add({PV: math.nan}, 520)
+    (summary,) = _feed(aggregator, lambda t: 1.0, 580, 3640)
+    stats = summary["attributes"][PV]
+    assert stats["covered"] == 60 + 3600 - 580
+    assert stats["coverage"] == pytest.approx(stats["covered"] / 3600)
+    assert stats["energy"] == pytest.approx(stats["covered"] / 3600)
+    assert stats["samples"] == 3 + 51
+
+
+def test_sliding_windows_share_panes():
+    aggregator = _aggregator(3600, step=900)
+    summaries = _feed(aggregator, lambda t: 1.0, 0, 5400)
+    assert [s["end"] for s in summaries] == [900, 1800, 2700, 3600, 4500, 5400]
+    assert all(s["end"] - s["start"] == 3600 for s in summaries)
+    assert [s["attributes"][PV]["energy"] for s in summaries] == pytest.approx(
+        [0.25, 0.5, 0.75, 1.0, 1.0, 1.0]
+    )
+
+
+def test_merge_summaries():
+    aggregator = _aggregator(3600)
+    summaries = _feed(aggregator, lambda t: 1.0 if t < 3600 else 3.0, 0, 7200)
+    merged = merge_summaries(summaries)
+    stats = merged["attributes"][PV]
+    assert (merged["start"], merged["end"]) == (0, 7200)
+    assert stats["samples"] == 120
+    assert stats["min"] == 1.0
+    assert stats["max"] == 3.0
+    assert stats["mean"] == pytest.approx(2.0)
+    assert stats["energy"] == pytest.approx(
+        sum(s["attributes"][PV]["energy"] for s in summaries)
+    )
+    assert stats["coverage"] == 1.0
+    assert merge_summaries([]) is None
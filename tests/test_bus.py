@@ -0,0 +1,34 @@
+import asyncio
+import logging
+
+from flaky import FlakyClient
+
+from growatt_client import GrowattBus, ModbusException
+from growatt_client.simulator import InverterSimulator, SimulatedBus
+
+
+def test_bus_reopens_the_port_after_a_failure():
+    transport = FlakyClient(SimulatedBus([InverterSimulator(1)]))
+    bus = GrowattBus("/dev/ttyTEST", client=transport)
+    bus.add_inverter(1, attributes=["grid_voltage"])
+
+    async def run():
+        await bus.get_inverter(1).update_hardware_info()
+        transport.failures = ["raise"]
+        return [
+            await bus.async_update_all(return_exceptions=True)
+            for _ in range(3)
+        ]
+
+    first, second, third = asyncio.run(run())
+    assert isinstance(first[1], ModbusException)
+    assert second == third == {1: {"grid_voltage": 0.0}}
+    assert transport.connects == 2
+
+
+def test_buses_share_one_log_handler():
+    logger = logging.getLogger("growatt_client.bus")
+    handlers = len(logger.handlers)
+    for _ in range(3):
+        GrowattBus("/dev/ttyTEST", client=FlakyClient(SimulatedBus()))
+    assert len(logger.handlers) == handlers
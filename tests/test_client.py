@@ -0,0 +1,60 @@
+import asyncio
+
+import pytest
+from flaky import FlakyClient
+from pymodbus.exceptions import ConnectionException
+
+from growatt_client import GrowattClient, ModbusException, PortLock
+from growatt_client.simulator import InverterSimulator, SimulatedBus
+
+ATTRIBUTES = ["grid_voltage", "import_from_grid"]
+
+
+def _client(**kwargs):
+    transport = FlakyClient(
+        SimulatedBus([InverterSimulator(1, values={"grid_voltage": 230.0})])
+    )
+    client = GrowattClient(
+        address=1, client=transport, attributes=ATTRIBUTES, **kwargs
+    )
+    return client, transport
+
+
+def test_raising_read_reconnects_on_the_next_poll(tmp_path):
+    lock = PortLock("/dev/ttyTEST", str(tmp_path))
+    client, transport = _client(port_lock=lock)
+    transport.failures = ["raise"]
+
+    async def run():
+        with pytest.raises(ConnectionException):
+            await client.async_update()
+        assert not lock.locked
+        return [await client.async_update() for _ in range(2)]
+
+    assert asyncio.run(run())[1]["grid_voltage"] == 230.0
+    assert transport.connects == 3
+    assert not lock.locked
+
+
+def test_failed_read_fails_the_poll_without_policy():
+    client, transport = _client()
+    asyncio.run(client.update_hardware_info())
+    transport.failures = ["error"]
+    with pytest.raises(ModbusException):
+        asyncio.run(client.async_update())
+    assert asyncio.run(client.async_update())["grid_voltage"] == 230.0
+
+
+def test_persistent_session_reconnects_and_retries():
+    client, transport = _client(persistent=True, reconnect_delay=0)
+
+    async def run():
+        async with client:
+            await client.update_hardware_info()
+            transport.failures = ["raise"]
+            data = await client.async_update()
+            return data, transport.connects
+
+    data, connects = asyncio.run(run())
+    assert data["grid_voltage"] == 230.0
+    assert connects == 2
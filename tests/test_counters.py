@@ -0,0 +1,67 @@
+import time
+
+from growatt_client import CounterTracker, SnapshotSchema
+
+TODAY = "photovoltaics_today"
+LIFETIME = "photovoltaics_lifetime"
+
+
+def _tracker(**kwargs):
+    return CounterTracker(names=[TODAY, LIFETIME], utc_offset=0, **kwargs)
+
+
+def test_counter_deltas():
+    tracker = _tracker()
+    assert tracker.update({TODAY: 1.0, LIFETIME: 100.0}, 1000) == {}
+    deltas = tracker.update({TODAY: 1.5, LIFETIME: 100.5}, 1060)
+    assert deltas == {TODAY: 0.5, LIFETIME: 0.5}
+
+
+def test_today_reset_at_midnight():
+    tracker = _tracker()
+    midnight = 20744 * 86400
+    tracker.update({TODAY: 30.0}, midnight - 60)
+    assert tracker.update({TODAY: 0.2}, midnight + 60) == {TODAY: 0.2}
+    assert tracker.get_rejected() == {}
+
+
+def test_decrease_during_the_day_is_rejected():
+    tracker = _tracker(rollover=0)
+    noon = 20744 * 86400 + 43200
+    tracker.update({TODAY: 10.0}, noon)
+    assert tracker.update({TODAY: 9.0}, noon + 60) == {}
+    assert tracker.get_rejected() == {TODAY: {"decrease": 1}}
+    assert tracker.get_last()[TODAY]["value"] == 10.0
+
+
+def test_torn_reading_is_rejected():
+    tracker = _tracker()
+    tracker.update({LIFETIME: 100.0}, 1000)
+    assert tracker.update({LIFETIME: 100.0 + 6553.6}, 1060) == {}
+    assert tracker.get_rejected() == {LIFETIME: {"torn": 1}}
+
+
+def test_snapshot_readings_use_the_snapshot_timestamp():
+    schema = SnapshotSchema([TODAY])
+    tracker = _tracker()
+    midnight = 20744 * 86400
+    tracker.update(schema.make({TODAY: 30.0}, midnight - 60))
+    assert tracker.get_last()[TODAY]["time"] == midnight - 60
+    # A replayed snapshot of the next morning is a reset, not a decrease
+    deltas = tracker.update(schema.make({TODAY: 0.2}, midnight + 7200))
+    assert deltas == {TODAY: 0.2}
+
+
+def test_snapshot_without_timestamp_is_read_now():
+    tracker = _tracker()
+    tracker.update(SnapshotSchema([TODAY]).make({TODAY: 1.0}))
+    assert abs(tracker.get_last()[TODAY]["time"] - time.time()) < 60
+
+
+def test_readings_are_saved_and_loaded(tmp_path):
+    path = str(tmp_path / "counters.json")
+    tracker = _tracker(path=path)
+    tracker.update({TODAY: 1.0}, 1000)
+    tracker.save()
+    restarted = _tracker(path=path)
+    assert restarted.update({TODAY: 1.5}, 1060) == {TODAY: 0.5}
@@ -0,0 +1,47 @@
+import random
+
+import pytest
+
+from growatt_client import ATTRIBUTES, BlockDecoder, get_value, plan_registers
+
+
+class _Registers:
+    def __init__(self, registers):
+        self.registers = registers
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_decoder_matches_get_value(seed):
+    rng = random.Random(seed)
+    values = [attr for attr in ATTRIBUTES if "pos" in attr]
+    for group in plan_registers(values):
+        registers = [rng.randrange(0x10000) for _ in range(group["length"])]
+        decoded = dict(
+            zip(group["decoder"].names, group["decoder"].decode(registers))
+        )
+        expected = {
+            v["name"]: get_value(
+                _Registers(registers),
+                v["pos"] - group["pos"],
+                v["type"],
+                v["scale"],
+            )
+            for v in group["values"]
+        }
+        assert decoded == expected
+
+
+def test_decode_many_matches_decode():
+    values = [
+        {"name": "a", "pos": 1, "type": "single_byte", "scale": 0.1},
+        {"name": "b", "pos": 3, "type": "double_byte", "scale": 0.1},
+        {"name": "c", "pos": 5, "type": "int_byte", "scale": 1},
+    ]
+    decoder = BlockDecoder(1, 5, values)
+    blocks = [[10, 0, 1, 2, 7], [65535, 1, 65535, 65535, 0]]
+    payload = b"".join(
+        word.to_bytes(2, "big") for block in blocks for word in block
+    )
+    assert list(decoder.decode_many(payload)) == [
+        decoder.decode(block) for block in blocks
+    ]
@@ -0,0 +1,39 @@
+import asyncio
+import os
+
+from growatt_client import async_discover, load_profile, save_profile
+from growatt_client.simulator import (
+    InverterSimulator,
+    SimulatedBus,
+    SimulatorClient,
+)
+
+
+def test_profiles_are_saved_per_serial_number(tmp_path):
+    path = str(tmp_path / "profiles.json")
+    save_profile({"serial_number": "SN1"}, "/dev/ttyUSB0", 1, path=path)
+    save_profile({"serial_number": "SN2"}, "/dev/ttyUSB0", 2, path=path)
+    assert load_profile("SN1", path=path) == {"serial_number": "SN1"}
+    assert load_profile(port="/dev/ttyUSB0", address=2, path=path) == {
+        "serial_number": "SN2"
+    }
+    assert os.listdir(tmp_path) == ["profiles.json"]
+
+
+def test_discover_finds_the_answered_registers(tmp_path):
+    path = str(tmp_path / "profiles.json")
+    bus = SimulatedBus([InverterSimulator(1, input_ranges=[(0, 99)])])
+    profile = asyncio.run(
+        async_discover(
+            "/dev/ttyUSB0",
+            1,
+            path=path,
+            client_factory=lambda baudrate: SimulatorClient(
+                bus, baudrate=None
+            ),
+        )
+    )
+    assert profile["serial_number"] == "SIM0000001"
+    assert "photovoltaics" in profile["supported"]
+    assert "import_from_grid" in profile["unsupported"]
+    assert load_profile(port="/dev/ttyUSB0", address=1, path=path) == profile
@@ -0,0 +1,53 @@
+import math
+import os
+
+from growatt_client import SnapshotSchema
+from growatt_client.export import ColumnarWriter, iter_chunks, read_chunk
+
+NAMES = ["grid_voltage", "photovoltaics"]
+
+
+def test_chunk_round_trip(tmp_path):
+    writer = ColumnarWriter(str(tmp_path), NAMES)
+    schema = SnapshotSchema(NAMES)
+    writer.append({"grid_voltage": 230.0, "photovoltaics": 1.5}, 100.0)
+    writer.append({"grid_voltage": 231.0}, 110.0)
+    writer.append(schema.make({"photovoltaics": 2.5}), 120.0)
+    path = writer.flush()
+
+    columns, timestamps, values = read_chunk(path)
+    assert [column["name"] for column in columns] == NAMES
+    assert columns[0]["unit"] == "V"
+    assert list(timestamps) == [100.0, 110.0, 120.0]
+    assert list(values["grid_voltage"])[:2] == [230.0, 231.0]
+    assert math.isnan(values["grid_voltage"][2])
+    assert math.isnan(values["photovoltaics"][1])
+    assert values["photovoltaics"][2] == 2.5
+    assert writer.flush() is None
+
+
+def test_chunks_roll_over_with_the_partition(tmp_path):
+    writer = ColumnarWriter(str(tmp_path), NAMES, partition="hour")
+    for timestamp in (3540.0, 3599.0, 3600.0, 3660.0):
+        writer.append({"grid_voltage": timestamp}, timestamp)
+    writer.close()
+
+    paths = list(iter_chunks(str(tmp_path)))
+    assert [os.path.relpath(os.path.dirname(p), tmp_path) for p in paths] == [
+        os.path.join("1970-01-01", "00"),
+        os.path.join("1970-01-01", "01"),
+    ]
+    assert [list(read_chunk(p)[1]) for p in paths] == [
+        [3540.0, 3599.0],
+        [3600.0, 3660.0],
+    ]
+
+
+def test_chunk_is_written_every_batch_size_rows(tmp_path):
+    writer = ColumnarWriter(str(tmp_path), NAMES, batch_size=2)
+    for timestamp in range(5):
+        writer.append({"grid_voltage": 230.0}, float(timestamp))
+    assert len(list(iter_chunks(str(tmp_path)))) == 2
+    writer.close()
+    rows = [len(read_chunk(p)[1]) for p in iter_chunks(str(tmp_path))]
+    assert rows == [2, 2, 1]
@@ -0,0 +1,41 @@
+import asyncio
+import json
+import logging
+import os
+
+from growatt_client import GrowattFleet, shared_path
+from growatt_client.exporter import GrowattExporter
+from growatt_client.simulator import (
+    InverterSimulator,
+    SimulatedBus,
+    SimulatorClient,
+)
+
+
+def _fleet():
+    fleet = GrowattFleet()
+    client = SimulatorClient(
+        SimulatedBus([InverterSimulator(1, values={"grid_voltage": 230.0})]),
+        baudrate=None,
+    )
+    fleet.add_port("/dev/ttyTEST", client).add_inverter(
+        1, attributes=["grid_voltage"]
+    )
+    return fleet
+
+
+def test_failed_publish_does_not_fail_the_poll(tmp_path, caplog):
+    # Below a file, the directory can not be created
+    (tmp_path / "file").write_text("")
+    directory = str(tmp_path / "file" / "shared")
+    exporter = GrowattExporter(_fleet(), shared_dir=directory)
+    with caplog.at_level(logging.WARNING):
+        asyncio.run(exporter.async_poll())
+    assert "Publishing /dev/ttyTEST:1 failed" in caplog.text
+    data = json.loads(exporter.render_json())
+    assert data["/dev/ttyTEST"]["1"]["data"] == {"grid_voltage": 230.0}
+
+    os.remove(tmp_path / "file")
+    asyncio.run(exporter.async_poll())
+    assert os.path.exists(shared_path("/dev/ttyTEST", 1, directory))
+    exporter.close_shared()
@@ -0,0 +1,40 @@
+import os
+
+import pytest
+
+from growatt_client.files import atomic_write
+
+
+def test_atomic_write_replaces_the_file(tmp_path):
+    path = str(tmp_path / "cache" / "data.json")
+    with atomic_write(path) as file:
+        file.write("first")
+    with atomic_write(path) as file:
+        file.write("second")
+    with open(path) as file:
+        assert file.read() == "second"
+    assert os.listdir(tmp_path / "cache") == ["data.json"]
+
+
+def test_atomic_write_keeps_the_file_on_error(tmp_path):
+    path = str(tmp_path / "data.json")
+    with atomic_write(path) as file:
+        file.write("kept")
+    with pytest.raises(RuntimeError):
+        with atomic_write(path) as file:
+            file.write("lost")
+            raise RuntimeError
+    with open(path) as file:
+        assert file.read() == "kept"
+    assert os.listdir(tmp_path) == ["data.json"]
+
+
+def test_atomic_write_uses_the_umask(tmp_path):
+    path = str(tmp_path / "data.bin")
+    umask = os.umask(0o022)
+    try:
+        with atomic_write(path, "wb", fsync=True) as file:
+            file.write(b"data")
+    finally:
+        os.umask(umask)
+    assert os.stat(path).st_mode & 0o777 == 0o644
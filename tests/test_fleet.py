@@ -0,0 +1,58 @@
+import asyncio
+import struct
+
+from flaky import LateReplyClient
+
+from growatt_client import GrowattFleet
+from growatt_client.simulator import (
+    InverterSimulator,
+    SimulatedBus,
+    SimulatorClient,
+)
+
+ATTRIBUTES = ["grid_voltage", "import_from_grid"]
+
+
+class BrokenClient(SimulatorClient):
+    """Simulator client failing every read with an unexpected error."""
+
+    async def read_input_registers(self, address, count=1, slave=0):
+        raise struct.error("unexpected")
+
+
+def _bus():
+    return SimulatedBus([InverterSimulator(1, values={"grid_voltage": 230.0})])
+
+
+def test_unexpected_error_of_one_port_does_not_abort_the_sweep():
+    fleet = GrowattFleet()
+    fleet.add_port("/dev/ttyA", BrokenClient(_bus(), baudrate=None))
+    fleet.add_port("/dev/ttyB", SimulatorClient(_bus(), baudrate=None))
+    for port in ("/dev/ttyA", "/dev/ttyB"):
+        fleet.get_bus(port).add_inverter(1, attributes=ATTRIBUTES)
+
+    result = asyncio.run(fleet.async_update_all())
+    assert list(result) == ["/dev/ttyB"]
+    assert result["/dev/ttyB"][1]["grid_voltage"] == 230.0
+    health = fleet.get_health()
+    assert health["/dev/ttyA"]["state"] == "degraded"
+    assert health["/dev/ttyB"]["state"] == "ok"
+
+
+def test_timed_out_port_is_reopened():
+    fleet = GrowattFleet(port_timeout=0.15)
+    transport = LateReplyClient(_bus(), reply_time=0.05)
+    bus = fleet.add_port("/dev/ttyA", transport)
+    bus.add_inverter(1, attributes=ATTRIBUTES)
+
+    async def run():
+        await bus.get_inverter(1).update_hardware_info()
+        # The reply to the second request comes during the next sweep
+        transport.delays = [0, 0.075]
+        first = await fleet.async_update_all()
+        second = await fleet.async_update_all()
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first == {}
+    assert second["/dev/ttyA"][1]["grid_voltage"] == 230.0
@@ -0,0 +1,89 @@
+import asyncio
+import datetime
+
+import pytest
+
+from growatt_client import (
+    GrowattClient,
+    RecordingClient,
+    RegisterRecorder,
+    VerifyException,
+)
+from growatt_client.simulator import (
+    InverterSimulator,
+    SimulatedBus,
+    SimulatorClient,
+)
+
+
+class TickingInverter(InverterSimulator):
+    """Inverter whose clock ticks a second between write and read."""
+
+    def __init__(self, address, ticks=1):
+        super().__init__(address)
+        self.ticks = ticks
+
+    def write(self, address, values):
+        result = super().write(address, values)
+        if address == 45 and len(values) == 6:
+            clock = datetime.datetime(*self.holding[45:51])
+            clock += datetime.timedelta(seconds=self.ticks)
+            self.holding[45:51] = [
+                clock.year,
+                clock.month,
+                clock.day,
+                clock.hour,
+                clock.minute,
+                clock.second,
+            ]
+        return result
+
+
+def _client(inverter):
+    return GrowattClient(
+        address=1,
+        client=SimulatorClient(SimulatedBus([inverter]), baudrate=None),
+    )
+
+
+def test_set_time_allows_the_clock_to_tick():
+    client = _client(TickingInverter(1))
+    when = datetime.datetime(2026, 10, 18, 23, 59, 59)
+    asyncio.run(client.async_set_time(when))
+    clock = asyncio.run(client.async_get_time())
+    assert clock == datetime.datetime(2026, 10, 19, 0, 0, 0)
+
+
+def test_set_time_fails_when_the_clock_is_off():
+    client = _client(TickingInverter(1, ticks=3600))
+    with pytest.raises(VerifyException):
+        asyncio.run(client.async_set_time(datetime.datetime(2026, 1, 1)))
+
+
+def test_write_holding_verifies_the_registers():
+    client = _client(InverterSimulator(1))
+    asyncio.run(client.async_write_holding({"active_power_rate": 80}))
+    data = asyncio.run(client.async_read_holding(["active_power_rate"]))
+    assert data == {"active_power_rate": 80}
+    with pytest.raises(ValueError):
+        asyncio.run(client.async_write_holding({"active_power_rate": 101}))
+
+
+def test_non_numeric_value_is_rejected():
+    client = _client(InverterSimulator(1))
+    for value in ("80", None, float("nan")):
+        with pytest.raises(ValueError):
+            asyncio.run(
+                client.async_write_holding({"active_power_rate": value})
+            )
+
+
+def test_write_holding_through_a_recording_client(tmp_path):
+    recorder = RegisterRecorder(str(tmp_path / "growatt.rec"))
+    bus = SimulatedBus([InverterSimulator(1)])
+    client = GrowattClient(
+        address=1,
+        client=RecordingClient(SimulatorClient(bus, baudrate=None), recorder),
+    )
+    asyncio.run(client.async_write_holding({"active_power_rate": 80}))
+    assert bus.get_inverter(1).holding[3] == 80
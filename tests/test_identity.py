@@ -0,0 +1,23 @@
+import os
+
+from growatt_client import IdentityCache
+
+
+def test_caches_on_one_file_keep_each_others_entries(tmp_path):
+    path = str(tmp_path / "identity.json")
+    first = IdentityCache(path)
+    second = IdentityCache(path)
+    assert first.get("/dev/ttyUSB0", 1) is None
+    assert second.get("/dev/ttyUSB0", 2) is None
+
+    first.put("/dev/ttyUSB0", 1, "RA1.0", "SN1", "T1")
+    second.put("/dev/ttyUSB0", 2, "RA1.0", "SN2", "T1")
+
+    cache = IdentityCache(path)
+    assert cache.get("/dev/ttyUSB0", 1)["serial_number"] == "SN1"
+    assert cache.get("/dev/ttyUSB0", 2)["serial_number"] == "SN2"
+
+    first.remove("/dev/ttyUSB0", 2)
+    assert IdentityCache(path).get("/dev/ttyUSB0", 2) is None
+    assert IdentityCache(path).get("/dev/ttyUSB0", 1) is not None
+    assert os.listdir(tmp_path) == ["identity.json"]
@@ -0,0 +1,39 @@
+import asyncio
+import copy
+
+from growatt_client import ATTRIBUTES, GrowattClient
+from growatt_client.simulator import (
+    InverterSimulator,
+    SimulatedBus,
+    SimulatorClient,
+)
+
+
+def _update(attribute_defs):
+    bus = SimulatedBus([InverterSimulator(1, registers={38: 2300})])
+    client = GrowattClient(
+        address=1,
+        client=SimulatorClient(bus, baudrate=None),
+        attributes=["grid_voltage"],
+        attribute_defs=attribute_defs,
+    )
+    return asyncio.run(client.async_update())
+
+
+def test_changed_definition_gets_a_layout_of_its_own():
+    attribute_defs = copy.deepcopy(ATTRIBUTES)
+    assert _update(attribute_defs) == {"grid_voltage": 230.0}
+    grid_voltage = next(
+        attr for attr in attribute_defs if attr["name"] == "grid_voltage"
+    )
+    grid_voltage["scale"] = 0.01
+    assert _update(attribute_defs) == {"grid_voltage": 23.0}
+
+
+def test_equal_definitions_share_a_layout():
+    first = GrowattClient(address=1, client=object())
+    second = GrowattClient(
+        address=2, client=object(), attribute_defs=copy.deepcopy(ATTRIBUTES)
+    )
+    assert first.get_register_plan() is second.get_register_plan()
+    assert first.get_schema() is second.get_schema()
@@ -0,0 +1,77 @@
+import asyncio
+import json
+
+import pytest
+
+from growatt_client import (
+    GrowattClient,
+    RegisterMap,
+    load_register_map,
+    select_register_map,
+)
+from growatt_client.simulator import (
+    InverterSimulator,
+    SimulatedBus,
+    SimulatorClient,
+)
+
+
+def _family(family, scale, firmware):
+    return RegisterMap(
+        family,
+        [{"name": "power", "pos": 1, "type": "single_byte", "scale": scale}],
+        match={"firmware": firmware},
+    )
+
+
+def test_maps_differing_in_scale_decode_differently():
+    fam_a = _family("fam_a", 0.1, "A*")
+    fam_b = _family("fam_b", 1, "B*")
+    assert fam_a.plan is not fam_b.plan
+
+    async def poll(firmware):
+        bus = SimulatedBus(
+            [InverterSimulator(1, registers={1: 500}, firmware=firmware)]
+        )
+        client = GrowattClient(
+            address=1,
+            client=SimulatorClient(bus, baudrate=None),
+            register_maps=[fam_a, fam_b],
+        )
+        data = await client.async_update()
+        return client.get_register_map(), data
+
+    assert asyncio.run(poll("A1.0")) == (fam_a, {"power": 50.0})
+    assert asyncio.run(poll("B1.0")) == (fam_b, {"power": 500.0})
+
+
+def test_select_prefers_the_most_specific_map():
+    generic = RegisterMap("generic", [{"name": "a", "pos": 0}])
+    model = RegisterMap(
+        "model",
+        [{"name": "a", "pos": 0}],
+        match={"model": "T1 *", "firmware": "SM*"},
+    )
+    assert select_register_map([generic, model], "T1 Q0", "SM1.0") is model
+    assert select_register_map([generic, model], "T2 Q0", "SM1.0") is generic
+
+
+@pytest.mark.parametrize(
+    "entry, message",
+    [
+        ({"name": "b", "pos": 1}, "overlaps"),
+        ({"name": "b", "pos": 5, "type": "quad"}, "unknown type"),
+        ({"name": "b", "pos": 5, "scal": 1}, "unknown keys"),
+        ({"name": "a", "pos": 5}, "defined twice"),
+        ({"name": "b", "template": "{missing} + 1"}, "missing"),
+    ],
+)
+def test_invalid_maps_fail_to_load(tmp_path, entry, message):
+    path = tmp_path / "bad.json"
+    path.write_text(
+        json.dumps(
+            {"family": "bad", "input": [{"name": "a", "pos": 0}, entry]}
+        )
+    )
+    with pytest.raises(ValueError, match=message):
+        load_register_map(str(path))
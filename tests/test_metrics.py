@@ -0,0 +1,47 @@
+import asyncio
+
+from flaky import FlakyClient
+
+from growatt_client import GrowattBus, GrowattClient, InMemoryMetrics
+from growatt_client.simulator import InverterSimulator, SimulatedBus
+
+
+def _connects(metrics, address):
+    histogram = metrics.histograms.get(
+        ("connect_seconds", (("address", address),))
+    )
+    return 0 if histogram is None else histogram.count
+
+
+def test_client_reports_every_connect():
+    metrics = InMemoryMetrics()
+    client = GrowattClient(
+        address=1,
+        client=FlakyClient(SimulatedBus([InverterSimulator(1)])),
+        attributes=["grid_voltage"],
+        metrics=metrics,
+    )
+    for _ in range(3):
+        asyncio.run(client.async_update())
+    assert _connects(metrics, 1) == 3
+
+
+def test_bus_reports_only_when_it_opens_the_port():
+    metrics = InMemoryMetrics()
+    transport = FlakyClient(
+        SimulatedBus([InverterSimulator(1), InverterSimulator(2)])
+    )
+    bus = GrowattBus("/dev/ttyTEST", client=transport, metrics=metrics)
+    for address in (1, 2):
+        bus.add_inverter(address, attributes=["grid_voltage"])
+
+    async def run():
+        for _ in range(3):
+            await bus.async_update_all()
+        transport.failures = ["raise"]
+        await bus.async_update_all(return_exceptions=True)
+        await bus.async_update_all()
+
+    asyncio.run(run())
+    assert transport.connects == 2
+    assert _connects(metrics, 1) + _connects(metrics, 2) == 2
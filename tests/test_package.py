@@ -0,0 +1,22 @@
+import importlib
+import pkgutil
+import types
+
+import growatt_client
+
+
+def test_package_exports_only_the_api():
+    for name in ("os", "json", "asyncio", "logging", "time", "MAGIC"):
+        assert not hasattr(growatt_client, name)
+    assert growatt_client.recording.MAGIC == b"GWRR"
+    assert growatt_client.shared.MAGIC == b"GWSS"
+
+
+def test_every_module_defines_all():
+    for info in pkgutil.iter_modules(growatt_client.__path__):
+        if info.name == "const":
+            continue
+        module = importlib.import_module(f"growatt_client.{info.name}")
+        for name in module.__all__:
+            value = getattr(module, name)
+            assert not isinstance(value, types.ModuleType), name
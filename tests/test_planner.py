@@ -0,0 +1,78 @@
+import itertools
+import random
+
+import pytest
+
+from growatt_client import ATTRIBUTES, plan_cost, plan_registers
+from growatt_client.const import DOUBLE_BYTE, SINGLE_BYTE
+from growatt_client.planner import value_width
+
+
+def _brute_force_cost(values, max_block, gap_cost):
+    """Cheapest cost over every split of the sorted values."""
+    values = sorted(values, key=lambda x: x["pos"])
+    best = None
+    for cuts in itertools.product((False, True), repeat=len(values) - 1):
+        cost = 0
+        group = [values[0]]
+        groups = []
+        for value, cut in zip(values[1:], cuts):
+            if cut:
+                groups.append(group)
+                group = []
+            group.append(value)
+        groups.append(group)
+        for group in groups:
+            end = max(v["pos"] + value_width(v) for v in group)
+            length = end - group[0]["pos"]
+            if length > max_block:
+                break
+            cost += gap_cost + length
+        else:
+            if best is None or cost < best:
+                best = cost
+    return best
+
+
+def _random_values(rng, count):
+    positions = rng.sample(range(0, 400, 2), count)
+    return [
+        {
+            "name": f"v{pos}",
+            "pos": pos,
+            "type": rng.choice((SINGLE_BYTE, DOUBLE_BYTE)),
+            "scale": 0.1,
+        }
+        for pos in positions
+    ]
+
+
+@pytest.mark.parametrize("seed", range(30))
+def test_plan_is_optimal(seed):
+    rng = random.Random(seed)
+    values = _random_values(rng, rng.randint(1, 9))
+    max_block = rng.choice((10, 40, 125))
+    gap_cost = rng.choice((0, 5, 30))
+    plan = plan_registers(values, max_block, gap_cost)
+    assert plan_cost(plan, gap_cost) == _brute_force_cost(
+        values, max_block, gap_cost
+    )
+
+
+def test_plan_reads_every_value_within_the_block_size():
+    values = [attr for attr in ATTRIBUTES if "pos" in attr]
+    plan = plan_registers(values, max_block=40)
+    planned = [v["name"] for group in plan for v in group["values"]]
+    assert sorted(planned) == sorted(v["name"] for v in values)
+    for group in plan:
+        assert group["length"] <= 40
+        for value in group["values"]:
+            assert group["pos"] <= value["pos"]
+            end = value["pos"] + value_width(value)
+            assert end <= group["pos"] + group["length"]
+
+
+def test_value_wider_than_a_block_is_rejected():
+    value = {"name": "a", "pos": 0, "type": DOUBLE_BYTE, "scale": 1}
+    with pytest.raises(ValueError):
+        plan_registers([value], max_block=1)
@@ -0,0 +1,106 @@
+import asyncio
+
+import pytest
+from flaky import FlakyClient, LateReplyClient
+
+from growatt_client import (
+    CircuitOpenException,
+    GrowattClient,
+    ModbusException,
+    ReadPolicy,
+)
+from growatt_client.simulator import InverterSimulator, SimulatedBus
+
+ATTRIBUTES = ["grid_voltage", "import_from_grid"]
+
+
+def _client(**kwargs):
+    transport = FlakyClient(
+        SimulatedBus([InverterSimulator(1, values={"grid_voltage": 230.0})])
+    )
+    client = GrowattClient(
+        address=1, client=transport, attributes=ATTRIBUTES, **kwargs
+    )
+    return client, transport
+
+
+def test_policy_retries_failed_reads():
+    policy = ReadPolicy(retries=2, retry_delay=0, jitter=0)
+    client, transport = _client(policy=policy)
+    asyncio.run(client.update_hardware_info())
+    transport.failures = ["crc", "exception 4"]
+    reads = transport.reads
+    data = asyncio.run(client.async_update())
+    assert data["grid_voltage"] == 230.0
+    assert transport.reads - reads == len(client.get_register_plan()) + 2
+
+
+def test_policy_times_out_and_returns_partial_data():
+    policy = ReadPolicy(retries=0, max_timeout=0.05, partial=True)
+    client, transport = _client(policy=policy)
+    asyncio.run(client.update_hardware_info())
+    transport.failures = ["slow"]
+    data = asyncio.run(client.async_update())
+    validity = client.get_validity()
+    assert sum(validity.values()) == 1
+    assert set(data) == {name for name, ok in validity.items() if ok}
+
+
+def test_circuit_opens_after_failed_polls():
+    policy = ReadPolicy(
+        retries=0, failures_to_open=2, breaker_delay=60, partial=True
+    )
+    client, transport = _client(policy=policy)
+    asyncio.run(client.update_hardware_info())
+    transport.failures = ["error"] * 4
+    for _ in range(2):
+        with pytest.raises(ModbusException):
+            asyncio.run(client.async_update())
+    with pytest.raises(CircuitOpenException):
+        asyncio.run(client.async_update())
+
+
+def test_late_reply_is_not_taken_for_the_next_request():
+    transport = LateReplyClient(
+        SimulatedBus([InverterSimulator(1, values={"grid_voltage": 230.0})])
+    )
+    client = GrowattClient(
+        address=1,
+        client=transport,
+        attributes=ATTRIBUTES,
+        policy=ReadPolicy(retries=0, max_timeout=0.05, retry_delay=0),
+    )
+    asyncio.run(client.update_hardware_info())
+    assert len(client.get_register_plan()) == 2
+    transport.delays = [0.05]
+    data = asyncio.run(client.async_update())
+    validity = client.get_validity()
+    assert sum(validity.values()) == 1
+    assert set(data) == {name for name, ok in validity.items() if ok}
+    data = asyncio.run(client.async_update())
+    assert data["grid_voltage"] == 230.0
+
+
+def test_late_write_reply_is_not_taken_for_the_next_request():
+    transport = LateReplyClient(SimulatedBus([InverterSimulator(1)]))
+    client = GrowattClient(
+        address=1,
+        client=transport,
+        policy=ReadPolicy(retries=0, max_timeout=0.05),
+    )
+    transport.delays = [0.05]
+    with pytest.raises(ModbusException):
+        asyncio.run(client.async_write_holding({"active_power_rate": 80}))
+    data = asyncio.run(client.async_read_holding(["active_power_rate"]))
+    assert data == {"active_power_rate": 80}
+
+
+def test_reply_of_the_wrong_length_is_a_failed_read():
+    policy = ReadPolicy(retries=1, retry_delay=0, jitter=0)
+    client, transport = _client(policy=policy)
+    asyncio.run(client.update_hardware_info())
+    transport.failures = ["short"]
+    connects = transport.connects
+    data = asyncio.run(client.async_update())
+    assert data["grid_voltage"] == 230.0
+    assert transport.connects - connects == 2
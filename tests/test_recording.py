@@ -0,0 +1,85 @@
+import asyncio
+import struct
+
+import pytest
+
+from growatt_client import (
+    GrowattClient,
+    ModbusException,
+    RecordingClient,
+    RegisterRecorder,
+    RegisterRecording,
+    ReplayClient,
+)
+from growatt_client.const import READ_INPUT_REGISTERS
+from growatt_client.simulator import (
+    InverterSimulator,
+    SimulatedBus,
+    SimulatorClient,
+)
+
+ATTRIBUTES = ["grid_voltage", "import_from_grid"]
+
+
+def _client(client):
+    return GrowattClient(address=1, client=client, attributes=ATTRIBUTES)
+
+
+def test_replay_serves_the_recorded_polls(tmp_path):
+    path = str(tmp_path / "growatt.rec")
+    inverter = InverterSimulator(1)
+    recorder = RegisterRecorder(path)
+    client = _client(
+        RecordingClient(
+            SimulatorClient(SimulatedBus([inverter]), baudrate=None),
+            recorder,
+        )
+    )
+    recorded = []
+    for voltage in (230.0, 231.0, 232.0):
+        inverter.set_value("grid_voltage", voltage)
+        recorded.append(asyncio.run(client.async_update()))
+    recorder.close()
+
+    replay = _client(ReplayClient(path))
+    assert [asyncio.run(replay.async_update()) for _ in recorded] == recorded
+    assert replay.get_serial_number() == client.get_serial_number()
+    with pytest.raises(ModbusException):
+        asyncio.run(replay.async_update())
+
+
+def _record(path, timestamps):
+    recorder = RegisterRecorder(path)
+    for index, timestamp in enumerate(timestamps):
+        recorder.record(1, READ_INPUT_REGISTERS, 38, [index], timestamp)
+    recorder.close()
+
+
+def test_seek_and_start(tmp_path):
+    path = str(tmp_path / "growatt.rec")
+    _record(path, [10.0, 20.0, 30.0])
+    recording = RegisterRecording(path)
+    assert len(recording) == 3
+    assert recording.seek(20.0) == 1
+    assert recording.seek(25.0) == 2
+    assert recording.seek(40.0) == 3
+    assert recording[1] == (20.0, 1, READ_INPUT_REGISTERS, 38, (1,))
+    assert bytes(recording.payload(2)) == b"\x00\x02"
+
+    replay = ReplayClient(recording, start=15.0)
+    registers = asyncio.run(replay.read_input_registers(38, 1, slave=1))
+    assert registers.registers == [1]
+    assert replay.timestamp == 20.0
+    recording.close()
+
+
+def test_partly_written_last_record_is_left_out(tmp_path):
+    path = str(tmp_path / "growatt.rec")
+    _record(path, [10.0, 20.0])
+    with open(path, "ab") as file:
+        # A third read of two registers, cut after the first one
+        file.write(struct.pack(">dBBHH", 30.0, 1, 4, 38, 2) + b"\x00\x01")
+    recording = RegisterRecording(path)
+    assert len(recording) == 2
+    assert recording.timestamp(1) == 20.0
+    recording.close()
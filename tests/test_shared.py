@@ -0,0 +1,89 @@
+import asyncio
+import os
+import subprocess
+import sys
+
+from growatt_client import (
+    GrowattFleet,
+    PortLock,
+    SharedSnapshotReader,
+    SharedSnapshotWriter,
+    SnapshotSchema,
+)
+from growatt_client.simulator import (
+    InverterSimulator,
+    SimulatedBus,
+    SimulatorClient,
+)
+
+
+def test_package_imports_without_fcntl():
+    code = (
+        "import sys\n"
+        "sys.modules['fcntl'] = None\n"
+        "import growatt_client\n"
+    )
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    subprocess.run([sys.executable, "-c", code], check=True, cwd=root)
+
+
+def test_port_lock_is_exclusive(tmp_path):
+    first = PortLock("/dev/ttyTEST", str(tmp_path))
+    second = PortLock("/dev/ttyTEST", str(tmp_path))
+    assert first.try_acquire()
+    assert not second.try_acquire()
+    first.release()
+    assert second.try_acquire()
+    second.release()
+
+
+def test_shared_snapshot_round_trip(tmp_path):
+    path = str(tmp_path / "inverter.snap")
+    schema = SnapshotSchema(["a", "b"])
+    writer = SharedSnapshotWriter(path, schema)
+    reader = SharedSnapshotReader(path)
+    assert reader.read() is None
+    writer.write({"a": 1.0, "b": 2.0}, 1000.0)
+    snapshot = reader.read()
+    assert snapshot.to_dict() == {"a": 1.0, "b": 2.0}
+    assert snapshot.timestamp == 1000.0
+    assert reader.version() == 1
+    writer.close()
+    assert reader.read() is None
+
+
+def _fleet(tmp_path, timeout=30):
+    fleet = GrowattFleet()
+    client = SimulatorClient(
+        SimulatedBus([InverterSimulator(1)]), baudrate=None
+    )
+    lock = PortLock("/dev/ttyTEST", str(tmp_path), timeout=timeout)
+    bus = fleet.add_port("/dev/ttyTEST", client, lock)
+    bus.add_inverter(1, attributes=["grid_voltage"])
+    return fleet
+
+
+def test_fleet_holds_the_port_lock(tmp_path):
+    fleet = _fleet(tmp_path)
+    other = PortLock("/dev/ttyTEST", str(tmp_path))
+
+    async def poll():
+        result = await fleet.async_update_all()
+        held = not other.try_acquire()
+        await fleet.async_close()
+        return result, held
+
+    result, held = asyncio.run(poll())
+    assert result == {"/dev/ttyTEST": {1: {"grid_voltage": 0.0}}}
+    assert held
+    assert other.try_acquire()
+    other.release()
+
+
+def test_fleet_fails_a_port_locked_elsewhere(tmp_path):
+    fleet = _fleet(tmp_path, timeout=0)
+    other = PortLock("/dev/ttyTEST", str(tmp_path))
+    assert other.try_acquire()
+    assert asyncio.run(fleet.async_update_all()) == {}
+    assert fleet.get_health()["/dev/ttyTEST"]["state"] == "degraded"
+    other.release()
@@ -0,0 +1,49 @@
+import asyncio
+import copy
+import pickle
+import time
+
+import pytest
+
+from growatt_client import GrowattClient, SnapshotSchema, WindowAggregator
+from growatt_client.simulator import (
+    InverterSimulator,
+    SimulatedBus,
+    SimulatorClient,
+)
+
+
+def test_snapshot_copies_and_pickles():
+    snapshot = SnapshotSchema(["a", "b"]).make({"a": 1.0}, 5.0)
+    for other in (
+        copy.copy(snapshot),
+        copy.deepcopy(snapshot),
+        pickle.loads(pickle.dumps(snapshot)),
+    ):
+        assert other.a == 1.0
+        assert other.timestamp == 5.0
+        assert other.schema == snapshot.schema
+
+
+def test_snapshot_unknown_attribute():
+    snapshot = SnapshotSchema(["a"]).make({"a": 1.0})
+    with pytest.raises(AttributeError):
+        snapshot.missing
+    with pytest.raises(AttributeError):
+        snapshot._private
+
+
+def test_update_snapshot_is_stamped_with_wall_clock_time():
+    bus = SimulatedBus([InverterSimulator(1)])
+    client = GrowattClient(
+        address=1, client=SimulatorClient(bus, baudrate=None)
+    )
+    before = time.time()
+    snapshot = asyncio.run(client.async_update_snapshot())
+    assert before <= snapshot.timestamp <= time.time()
+
+    # Windows are aligned to epoch hours
+    hourly = WindowAggregator(3600)
+    hourly.add(snapshot)
+    summary = hourly.flush()[0]
+    assert summary["start"] == before // 3600 * 3600
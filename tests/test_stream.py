@@ -0,0 +1,71 @@
+import asyncio
+
+import pytest
+from flaky import FlakyClient
+
+from growatt_client import GrowattClient, ModbusException
+from growatt_client.simulator import InverterSimulator, SimulatedBus
+
+
+def _client():
+    inverter = InverterSimulator(1, values={"grid_voltage": 230.0})
+    transport = FlakyClient(SimulatedBus([inverter]))
+    client = GrowattClient(
+        address=1,
+        client=transport,
+        attributes=["grid_voltage", "import_from_grid"],
+    )
+    return client, inverter, transport
+
+
+def test_stream_yields_changes_beyond_the_deadband():
+    client, inverter, transport = _client()
+
+    async def run():
+        stream = client.stream(interval=0.01, deadband=0.5)
+        changes = [(await stream.__anext__())[1]]
+        inverter.set_value("grid_voltage", 230.3)
+        inverter.set_value("import_from_grid", 5.0)
+        changes.append((await stream.__anext__())[1])
+        inverter.set_value("grid_voltage", 230.6)
+        changes.append((await stream.__anext__())[1])
+        await stream.aclose()
+        return changes
+
+    assert asyncio.run(run()) == [
+        {"grid_voltage": 230.0, "import_from_grid": 0.0},
+        {"import_from_grid": 5.0},
+        {"grid_voltage": 230.6},
+    ]
+
+
+def test_stream_skips_failed_polls():
+    client, inverter, transport = _client()
+
+    async def run():
+        stream = client.stream(interval=0.01)
+        await stream.__anext__()
+        transport.failures = ["error"]
+        inverter.set_value("import_from_grid", 5.0)
+        reads = transport.reads
+        changes = (await stream.__anext__())[1]
+        await stream.aclose()
+        return changes, transport.reads - reads
+
+    changes, reads = asyncio.run(run())
+    assert changes == {"import_from_grid": 5.0}
+    # The failed poll and the next one
+    assert reads == 3
+
+
+def test_stream_ends_on_errors_without_skip_errors():
+    client, inverter, transport = _client()
+
+    async def run():
+        stream = client.stream(interval=0.01, skip_errors=False)
+        await stream.__anext__()
+        transport.failures = ["error"]
+        await stream.__anext__()
+
+    with pytest.raises(ModbusException):
+        asyncio.run(run())
@@ -0,0 +1,46 @@
+import pytest
+
+from growatt_client import TemplateException, compile_templates
+
+
+def _template(name, template):
+    return {"name": name, "template": template}
+
+
+@pytest.mark.parametrize(
+    "template, message",
+    [
+        ("{a} +", "invalid"),
+        ("abs({a})", "Call"),
+        ("{a}.real", "Attribute"),
+        ("{a} + 'x'", "non numeric"),
+        ("[{a}]", "List"),
+    ],
+)
+def test_invalid_templates_are_rejected(template, message):
+    with pytest.raises(TemplateException, match=message):
+        compile_templates([_template("t", template)], {"a"})
+
+
+def test_missing_input_is_rejected():
+    with pytest.raises(TemplateException, match="uses b"):
+        compile_templates([_template("t", "{a} + {b}")], {"a"})
+
+
+def test_cycle_is_rejected():
+    templates = [_template("t", "{u} + 1"), _template("u", "{t} + 1")]
+    with pytest.raises(TemplateException, match="depends on itself"):
+        compile_templates(templates, set())
+
+
+def test_templates_come_after_their_inputs():
+    templates = [
+        _template("total", "{part} + {a}"),
+        _template("part", "{a} * 2 if {a} > 0 else 0"),
+    ]
+    ordered = compile_templates(templates, {"a"})
+    assert [t.name for t in ordered] == ["part", "total"]
+    data = {"a": 1.5}
+    for templ in ordered:
+        data[templ.name] = templ.evaluate(data)
+    assert data == {"a": 1.5, "part": 3.0, "total": 4.5}
@@ -0,0 +1,57 @@
+import asyncio
+import time
+
+from growatt_client import GrowattClient
+from growatt_client.simulator import (
+    InverterSimulator,
+    SimulatedBus,
+    SimulatorClient,
+)
+
+TODAY = "photovoltaics_1_today"
+LIFETIME = "photovoltaics_lifetime"
+
+
+def test_tiers_read_every_request_at_its_interval():
+    inverter = InverterSimulator(1, values={"grid_voltage": 230.0})
+    bus = SimulatedBus([inverter])
+    client = GrowattClient(
+        address=1,
+        client=SimulatorClient(bus, baudrate=None),
+        attributes=["grid_voltage", TODAY, LIFETIME],
+        intervals={TODAY: 0.05},
+    )
+    assert len(client.get_register_plan()) == 3
+
+    async def run():
+        await client.update_hardware_info()
+        requests = []
+        for value in (1.0, 2.0):
+            inverter.set_value(TODAY, value)
+            start = bus.requests
+            data = await client.async_update()
+            requests.append(bus.requests - start)
+            times = client.get_read_times()
+        # Both polls within the interval of the today counter
+        assert data[TODAY] == 1.0
+        await asyncio.sleep(0.06)
+        start = bus.requests
+        data = await client.async_update()
+        requests.append(bus.requests - start)
+        return requests, times, data
+
+    before = time.monotonic()
+    requests, times, data = asyncio.run(run())
+    assert requests == [3, 1, 2]
+    assert data[TODAY] == 2.0
+    read_times = client.get_read_times()
+    assert read_times[LIFETIME] == times[LIFETIME]
+    assert read_times[TODAY] > times[TODAY]
+    assert read_times["grid_voltage"] > times["grid_voltage"] >= before
+
+
+def test_read_times_are_none_before_the_first_poll():
+    client = GrowattClient(
+        address=1, client=object(), attributes=["grid_voltage"], tiered=True
+    )
+    assert client.get_read_times() == {"grid_voltage": None}